@@ -0,0 +1,73 @@
+from recipes.models import Recipe
+from users.models import User
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def get_bulk_ids(serializer_class, data, field):
+    """Проверенные id из тела запроса без повторов, в исходном порядке."""
+    serializer = serializer_class(data=data)
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data[field]))
+
+
+def lock_user(user):
+    """Блокирует строку пользователя до конца транзакции."""
+    list(User.objects.select_for_update().filter(pk=user.pk).values('pk'))
+
+
+def lock_users(ids):
+    """Блокирует строки пользователей ids по возрастанию id."""
+    return set(User.objects.select_for_update().filter(
+        pk__in=ids
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def lock_recipes(ids):
+    """Блокирует рецепты ids (раньше пользователей), возвращает найденные."""
+    return set(Recipe.objects.select_for_update().filter(
+        pk__in=ids
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def bulk_add(relation, user, field, ids):
+    """Создает связи user -> ids модели relation, возвращает новые id."""
+    existing = set(relation.objects.filter(
+        user=user, **{f'{field}__in': ids}
+    ).values_list(f'{field}_id', flat=True))
+    created = [pk for pk in ids if pk not in existing]
+    relation.objects.bulk_create(
+        [relation(user=user, **{f'{field}_id': pk}) for pk in created],
+        ignore_conflicts=True
+    )
+    return created
+
+
+def bulk_remove(relation, user, field, ids):
+    """Удаляет связи user -> ids модели relation, возвращает удаленные id."""
+    links = relation.objects.filter(user=user, **{f'{field}__in': ids})
+    deleted = list(links.values_list(f'{field}_id', flat=True))
+    links.delete()
+    return deleted
+
+
+def bulk_statuses(ids, found, changed, changed_status, unchanged_status,
+                  skipped=()):
+    """Статус каждого id из запроса в порядке запроса."""
+    results = []
+    for pk in ids:
+        if pk in skipped:
+            status = SELF
+        elif pk not in found:
+            status = NOT_FOUND
+        elif pk in changed:
+            status = changed_status
+        else:
+            status = unchanged_status
+        results.append({'id': pk, 'status': status})
+    return {'results': results}
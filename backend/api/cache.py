@@ -0,0 +1,126 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date, parse_http_date_safe
+
+from core.cache import get_versions
+from core.constants import RESPONSE_CACHE_TIMEOUT
+
+VALIDATOR_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class CachedResponseMixin:
+    """Кеш ответов list/retrieve для анонимов, ETag и 304 для всех."""
+    cache_namespaces = ()
+    cache_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_request_signature(self, request):
+        """Схема, хост, путь и параметры запроса."""
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        origin = request.build_absolute_uri('/').rstrip('/')
+        return f'{origin}{request.path}?{urlencode(params, doseq=True)}'
+
+    def get_response_cache_key(self, request):
+        if (self.action not in self.cache_actions
+                or not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return None
+        versions = sorted(
+            get_versions(*self.get_cache_namespaces(request)).items()
+        )
+        key = f'{self.get_request_signature(request)}#{versions}'
+        return 'response:' + md5(key.encode()).hexdigest()
+
+    def get_cache_namespaces(self, request):
+        return self.cache_namespaces
+
+    def get_validators(self, request):
+        """ETag и Last-Modified (Unix-время) ответа или None."""
+        return None
+
+    def set_validators(self, response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        self.set_cache_control(response)
+
+    @staticmethod
+    def set_cache_control(response):
+        """Браузер перепроверяет ответ и не отдает его другому токену."""
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        self.response_cache_key = self.get_response_cache_key(request)
+        if self.response_cache_key is not None:
+            cached = cache.get(self.response_cache_key)
+            if cached is not None:
+                self.response_cache_key = None
+                headers, content = cached
+                response = HttpResponse(content)
+                for name, value in headers.items():
+                    response[name] = value
+                self.set_cache_control(response)
+                return get_conditional_response(
+                    request,
+                    etag=headers.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        headers.get('Last-Modified')
+                    ),
+                    response=response
+                )
+        self.etag, self.last_modified = (
+            self.get_validators(request) or (None, None)
+        )
+        if self.etag is not None or self.last_modified is not None:
+            response = get_conditional_response(
+                request, etag=self.etag, last_modified=self.last_modified
+            )
+            if response is not None:
+                self.response_cache_key = None
+                self.set_validators(response, self.etag, self.last_modified)
+                return response
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, 'response_cache_key', None)
+        etag = getattr(self, 'etag', None)
+        last_modified = getattr(self, 'last_modified', None)
+        if response.status_code != 200 or (
+            key is None and etag is None and last_modified is None
+        ):
+            return response
+        if etag is None and key is not None:
+            response.render()
+            etag = quote_etag(md5(response.content).hexdigest())
+        self.set_validators(response, etag, last_modified)
+        if key is not None:
+            response.render()
+            headers = {
+                name: response[name]
+                for name in VALIDATOR_HEADERS if response.has_header(name)
+            }
+            cache.set(key, (headers, response.content),
+                      RESPONSE_CACHE_TIMEOUT)
+        return get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified,
+                                        response=response)
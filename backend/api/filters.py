@@ -1,10 +1,41 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import (Count, ExpressionWrapper, F, FloatField,
+                              OuterRef, Q, Subquery)
+from django.db.models.functions import Cast
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Recipe, Tag
+from core.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import IngredientOnRecipe, Recipe, Tag
+from recipes.search import SEARCH_CONFIG, get_ingredient_index
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """Сортировка с -id последним ключом, чтобы страницы не пересекались."""
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value in EMPTY_VALUES:
+            return qs
+        return qs.order_by(*qs.query.order_by, '-id')
 
 
 class RecipeFilter(FilterSet):
+    """Фильтры рецептов.
+
+    min_favorites и ordering=-favorites опираются на счетчик
+    favorites_count и индекс recipe_favorites_count_idx.
+    """
+    search = filters.CharFilter(method='get_search')
+    ingredients = NumberInFilter(method='get_ingredients')
+    missing = filters.NumberFilter(method='get_missing', min_value=0)
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
@@ -14,11 +45,73 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    min_favorites = filters.NumberFilter(
+        field_name='favorites_count',
+        lookup_expr='gte'
+    )
+    ordering = StableOrderingFilter(
+        fields=(('favorites_count', 'favorites'), ('pub_date', 'pub_date'))
+    )
 
     class Meta:
         model = Recipe
         fields = ['author', 'is_favorited', 'tags']
 
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию.
+
+        На PostgreSQL - по search_vector с сортировкой по SearchRank,
+        на остальных СУБД - простое вхождение подстроки.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+
+    def get_ingredients(self, queryset, name, value):
+        """Рецепты из имеющихся ингредиентов.
+
+        Сортировка по доле ингредиентов рецепта, которые есть у
+        пользователя; missing ограничивает число недостающих.
+        Считается подзапросами по IngredientOnRecipe для рецептов,
+        содержащих хотя бы один из ингредиентов.
+        """
+        if not value:
+            return queryset
+        amounts = IngredientOnRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(count=Count('pk'))
+        queryset = queryset.filter(
+            pk__in=IngredientOnRecipe.objects.filter(
+                ingredient__in=value
+            ).values('recipe')
+        ).annotate(
+            matched=Subquery(
+                amounts.filter(ingredient__in=value).values('count')
+            ),
+            total=Subquery(amounts.values('count')),
+            coverage=ExpressionWrapper(
+                Cast('matched', FloatField()) / F('total'),
+                output_field=FloatField()
+            )
+        )
+        missing = self.form.cleaned_data.get('missing')
+        if missing is not None:
+            queryset = queryset.filter(total__lte=F('matched') + missing)
+        return queryset.order_by('-coverage', '-matched', '-pub_date')
+
+    def get_missing(self, queryset, name, value):
+        """Учитывается в get_ingredients."""
+        return queryset
+
     def get_is_favorited(self, queryset, name, value):
         if value:
             return queryset.filter(favoriterecipes__user=self.request.user)
@@ -30,5 +123,57 @@ class RecipeFilter(FilterSet):
         return queryset
 
 
-class IngredientFilter(SearchFilter):
+class IngredientFilter(BaseFilterBackend):
+    """Поиск ингредиентов по названию.
+
+    Сначала идут ингредиенты, название которых начинается с запроса,
+    затем содержащие его; выдача ограничена параметром limit.
+    На PostgreSQL поиск опирается на индексы по UPPER(name) из
+    миграции recipes.0003. Если включен INGREDIENT_SEARCH_INDEX или
+    СУБД другая (SQLite в тестах, где LIKE не учитывает регистр
+    кириллицы), ответ берется из индекса в памяти процесса.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        limit = self.get_limit(request)
+        if (not settings.INGREDIENT_SEARCH_INDEX
+                and connections[queryset.db].vendor == 'postgresql'):
+            ingredients = self.search_database(queryset, name, limit)
+        else:
+            ingredients = get_ingredient_index().search(name, limit)
+        if view.action == 'list':
+            return ingredients
+        return queryset.filter(
+            pk__in=[ingredient.pk for ingredient in ingredients]
+        )
+
+    @staticmethod
+    def search_database(queryset, name, limit):
+        """Совпадения по началу названия, затем по вхождению.
+
+        Каждая часть - отдельный запрос со своим индексом: начало
+        названия ищется по UPPER(name) text_pattern_ops, вхождение -
+        по триграммам, и только если начал не хватило до limit.
+        """
+        ingredients = list(
+            queryset.filter(name__istartswith=name).order_by('name')[:limit]
+        )
+        if len(ingredients) < limit:
+            ingredients.extend(queryset.filter(
+                name__icontains=name
+            ).exclude(
+                name__istartswith=name
+            ).order_by('name')[:limit - len(ingredients)])
+        return ingredients
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return INGREDIENT_SEARCH_LIMIT
+        return limit if limit > 0 else INGREDIENT_SEARCH_LIMIT
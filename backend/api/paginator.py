@@ -1,8 +1,173 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import md5
+from urllib.parse import urlencode
 
-from core.constants import PAGINATION_PAGE_SIZE
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.cache import get_versions, user_namespace
+from core.constants import (COUNT_CACHE_TIMEOUT, COUNT_ESTIMATE_THRESHOLD,
+                            PAGINATION_PAGE_SIZE)
+from recipes.feed import seek
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с кешируемым или оценочным COUNT(*)."""
+
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return super().count
+        cached = cache.get(self.cache_key)
+        if cached is not None:
+            count, self.count_is_exact = cached
+            return count
+        count = self.estimate_count()
+        if count is None:
+            count = super().count
+        else:
+            self.count_is_exact = False
+        cache.set(self.cache_key, (count, self.count_is_exact),
+                  COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimate_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return int(row[0])
 
 
 class CustomPagination(PageNumberPagination):
+    """Пагинация по номеру страницы с кешируемым количеством."""
+    page_size_query_param = 'limit'
+    page_size = PAGINATION_PAGE_SIZE
+    count_cache_ignored_params = ('page', 'limit', 'format')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_cache_key = self.get_count_cache_key(request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(object_list, per_page,
+                                    cache_key=self.count_cache_key)
+
+    def get_count_cache_key(self, request, view):
+        if getattr(view, 'action', None) != 'list':
+            return None
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name not in self.count_cache_ignored_params
+        )
+        namespaces = []
+        if hasattr(view, 'get_cache_namespaces'):
+            namespaces.extend(view.get_cache_namespaces(request))
+        user_params = getattr(view, 'user_filter_params', ())
+        user = ''
+        if any(name in user_params for name, _ in params):
+            user = request.user.pk
+            namespaces.append(user_namespace(user))
+        versions = sorted(get_versions(*namespaces).items())
+        key = (f'{request.path}?{urlencode(params, doseq=True)}'
+               f'#{user}#{versions}')
+        return 'count:' + md5(key.encode()).hexdigest()
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по курсору (pub_date, id) без COUNT и OFFSET."""
+    cursor_query_param = 'cursor'
     page_size_query_param = 'limit'
     page_size = PAGINATION_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+    invalid_ordering_message = (
+        'Параметр cursor нельзя сочетать с сортировкой, поиском '
+        'и подбором по ингредиентам.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if queryset.query.order_by not in ((), self.ordering):
+            raise ValidationError(
+                {self.cursor_query_param: self.invalid_ordering_message}
+            )
+        queryset = seek(
+            queryset.order_by(*self.ordering), self.decode_cursor(request)
+        )
+        results = list(queryset[:page_size + 1])
+        self.page = results[:page_size]
+        self.has_next = len(results) > page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_cursor(recipe):
+        return urlsafe_b64encode(
+            f'{recipe.pub_date.isoformat()}|{recipe.pk}'.encode('ascii')
+        ).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,200 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+SHOPPING_LIST_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+TRANSLITERATION = dict(zip(
+    'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+    ('a', 'b', 'v', 'g', 'd', 'e', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm',
+     'n', 'o', 'p', 'r', 's', 't', 'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch',
+     '', 'y', '', 'e', 'yu', 'ya')
+))
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Сам список отдается потоком через stream(), render() вызывается
+    DRF только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, ingredients):
+        """Генератор частей файла из строк name/measurement_unit/amount."""
+        raise NotImplementedError('stream() must be implemented.')
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в виде текста"""
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield f'{SHOPPING_LIST_TITLE}\n'
+        for ingredient in ingredients:
+            yield (
+                f'{ingredient["name"]}'
+                f'({ingredient["measurement_unit"]}) - '
+                f'{ingredient["amount"]}\n'
+            )
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку"""
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV"""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(SHOPPING_LIST_HEADER)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['amount'],
+            ))
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате JSON"""
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        separator = '['
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF.
+
+    Документ собирается без сторонних библиотек: страницы пишутся в
+    поток по мере чтения строк, таблица xref - в конце. Используется
+    стандартный шрифт Helvetica, в котором нет кириллицы, поэтому
+    текст транслитерируется.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    lines_per_page = 50
+    font_size = 12
+    leading = 15
+    page_size = (595, 842)
+    margin = 50
+
+    def stream(self, ingredients):
+        offsets = {}
+        position = 0
+
+        def write(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+            position += len(chunk)
+            return chunk
+
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        position = len(header)
+        yield header
+        yield write(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        yield write(3, (b'<< /Type /Font /Subtype /Type1 '
+                        b'/BaseFont /Helvetica '
+                        b'/Encoding /WinAnsiEncoding >>'))
+
+        pages = []
+        lines = [SHOPPING_LIST_TITLE, '']
+        for ingredient in ingredients:
+            lines.append(
+                f'{ingredient["name"]} ({ingredient["measurement_unit"]})'
+                f' - {ingredient["amount"]}'
+            )
+            if len(lines) == self.lines_per_page:
+                number = 4 + 2 * len(pages)
+                pages.append(number + 1)
+                yield write(number, self.page_content(lines))
+                yield write(number + 1, self.page_object(number))
+                lines = []
+        if lines or not pages:
+            number = 4 + 2 * len(pages)
+            pages.append(number + 1)
+            yield write(number, self.page_content(lines))
+            yield write(number + 1, self.page_object(number))
+
+        kids = ' '.join(f'{page} 0 R' for page in pages)
+        yield write(2, (f'<< /Type /Pages /Kids [{kids}] '
+                        f'/Count {len(pages)} >>').encode())
+
+        size = max(offsets) + 1
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{offsets[number]:010d} 00000 n \n'
+            for number in range(1, size)
+        )
+        xref.append(
+            f'trailer\n<< /Size {size} /Root 1 0 R >>\n'
+            f'startxref\n{position}\n%%EOF\n'
+        )
+        yield ''.join(xref).encode()
+
+    def page_object(self, content_number):
+        width, height = self.page_size
+        return (
+            f'<< /Type /Page /Parent 2 0 R '
+            f'/MediaBox [0 0 {width} {height}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> '
+            f'/Contents {content_number} 0 R >>'
+        ).encode()
+
+    def page_content(self, lines):
+        top = self.page_size[1] - self.margin
+        text = ''.join(f'({self.escape(line)}) Tj T*\n' for line in lines)
+        content = (
+            f'BT\n/F1 {self.font_size} Tf\n{self.leading} TL\n'
+            f'{self.margin} {top} Td\n{text}ET'
+        ).encode('cp1252', errors='replace')
+        return (
+            f'<< /Length {len(content)} >>\nstream\n'.encode()
+            + content + b'\nendstream'
+        )
+
+    @staticmethod
+    def escape(line):
+        line = ''.join(
+            TRANSLITERATION.get(char.lower(), char).capitalize()
+            if char.isupper() else TRANSLITERATION.get(char, char)
+            for char in str(line)
+        )
+        return (line.replace('\\', '\\\\')
+                    .replace('(', '\\(')
+                    .replace(')', '\\)'))
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
@@ -1,12 +1,18 @@
-import base64
+from hashlib import md5
 
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
 from django.db.transaction import atomic
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from recipes.models import Ingredient, IngredientOnRecipe, Recipe, Tag
+from api.bulk import lock_recipes
+from core.constants import (BULK_MAX_ITEMS, FRAGMENT_CACHE_TIMEOUT,
+                            RECIPES_LIMIT)
+from recipes.images import ImageError, normalize_upload, rendition_urls
+from recipes.models import (Ingredient, IngredientOnRecipe, Recipe,
+                            ShoppingCartItem, Tag)
 from users.models import User
 
 
@@ -14,14 +20,26 @@ class Base64ImageField(serializers.ImageField):
     """Обработка изображения"""
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            _, imgstr = data.split(';base64,', 1)
+            try:
+                data = normalize_upload(imgstr)
+            except ImageError:
+                self.fail('invalid_image')
 
         return super().to_internal_value(data)
 
 
+class ImageRenditionsField(serializers.Field):
+    """Ссылки на уменьшенные копии картинки по размерам и форматам"""
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return rendition_urls(recipe, self.context.get('request'))
+
+
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Сериализатор кастомного юзера"""
     email = serializers.EmailField(
@@ -60,13 +78,21 @@ class CustomUserSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        return obj.following.filter(user=user).exists()
+        return obj.id in self.get_subscriptions(user)
+
+    def get_subscriptions(self, user):
+        """Id авторов из подписок, один запрос на весь ответ."""
+        if 'subscriptions' not in self.context:
+            self.context['subscriptions'] = set(
+                user.follower.values_list('following_id', flat=True)
+            )
+        return self.context['subscriptions']
 
 
 class UserWithRecipesSerializer(CustomUserSerializer):
     """Сериализтор кастомного юзера с рецептом и счетчиком"""
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -82,14 +108,31 @@ class UserWithRecipesSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, user):
+        if hasattr(user, 'recipes_preview'):
+            return ShortRecipeSerializer(user.recipes_preview, many=True).data
         recipes_limit = self.context['request'].GET.get(
-            'recipes_limit', default=3
+            'recipes_limit', default=RECIPES_LIMIT
         )
         recipes_user = user.recipes.all()[:int(recipes_limit)]
         return ShortRecipeSerializer(recipes_user, many=True).data
 
-    def get_recipes_count(self, user):
-        return user.recipes.count()
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Список id рецептов для массовых операций"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+
+class BulkAuthorsSerializer(serializers.Serializer):
+    """Список id авторов для массовой подписки"""
+    authors = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -118,7 +161,7 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 class AddIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор количества ингредиента в создании рецепта"""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = IngredientOnRecipe
@@ -144,11 +187,72 @@ class AddTagSerializer(serializers.ModelSerializer):
         fields = ('__all__')
 
 
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    """Список рецептов из кеша фрагментов по id и updated_at."""
+    related = ('author', 'tags', 'ingredients_amount__ingredient')
+
+    def to_representation(self, data):
+        recipes = list(data)
+        base_url = self.context['request'].build_absolute_uri('/')
+        keys = {
+            recipe.pk: self.get_fragment_key(recipe, base_url)
+            for recipe in recipes
+        }
+        fragments = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            fragments.update(self.build_fragments(missing, keys))
+        representation = []
+        for recipe in recipes:
+            fragment = fragments[keys[recipe.pk]]
+            fragment['author']['is_subscribed'] = self.get_is_subscribed(
+                recipe
+            )
+            fragment['is_favorited'] = self.child.get_is_favorited(recipe)
+            fragment['is_in_shopping_cart'] = (
+                self.child.get_is_in_shopping_cart(recipe)
+            )
+            representation.append(fragment)
+        return representation
+
+    @staticmethod
+    def get_fragment_key(recipe, base_url):
+        return 'recipe:{}:{}:{}'.format(
+            recipe.pk,
+            recipe.updated_at.isoformat(),
+            md5(base_url.encode()).hexdigest()
+        )
+
+    def build_fragments(self, recipes, keys):
+        prefetch_related_objects(recipes, *self.related)
+        fragments = {}
+        for recipe in recipes:
+            fragment = self.child.to_representation(recipe)
+            fragment['author']['is_subscribed'] = False
+            fragment['is_favorited'] = False
+            fragment['is_in_shopping_cart'] = False
+            fragments[keys[recipe.pk]] = fragment
+        cache.set_many(fragments, FRAGMENT_CACHE_TIMEOUT)
+        return fragments
+
+    def get_is_subscribed(self, recipe):
+        if hasattr(recipe, 'is_subscribed'):
+            return recipe.is_subscribed
+        user = self.context['request'].user
+        return not user.is_anonymous and (
+            recipe.author_id
+            in self.child.fields['author'].get_subscriptions(user)
+        )
+
+
 class RecipeListSerializer(serializers.ModelSerializer):
     """Сериализатор отображения списка рецептов"""
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer()
     image = Base64ImageField(required=False, allow_null=True)
+    images = ImageRenditionsField()
     ingredients = IngredientAmountSerializer(
         many=True,
         source='ingredients_amount'
@@ -167,17 +271,23 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeFragmentListSerializer
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context['request'].user
         return not user.is_anonymous and (recipe.
                                           favoriterecipes.
                                           filter(user=user).exists())
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context['request'].user
         return not user.is_anonymous and (recipe.
                                           shoppinglists.
@@ -186,8 +296,8 @@ class RecipeListSerializer(serializers.ModelSerializer):
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор создания рецепта"""
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(),
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
     )
     image = Base64ImageField(required=False, allow_null=True)
     ingredients = AddIngredientSerializer(many=True)
@@ -203,6 +313,45 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
+    def validate_tags(self, tag_ids):
+        tags, errors = self.resolve_ids(Tag, tag_ids, 'тегов', 'Теги')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [tags[pk] for pk in tag_ids]
+
+    def validate_ingredients(self, items):
+        ingredients, errors = self.resolve_ids(
+            Ingredient, [item['id'] for item in items],
+            'ингредиентов', 'Ингредиенты'
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [
+            {**item, 'id': ingredients[item['id']]} for item in items
+        ]
+
+    @staticmethod
+    def resolve_ids(model, ids, genitive, plural):
+        """Объекты model по ids и ошибки о несуществующих и повторах."""
+        objects = model.objects.in_bulk(set(ids))
+        errors = []
+        missing = sorted({pk for pk in ids if pk not in objects})
+        if missing:
+            errors.append(
+                f'Нет {genitive} с id: {", ".join(map(str, missing))}.'
+            )
+        seen, duplicates = set(), set()
+        for pk in ids:
+            if pk in seen:
+                duplicates.add(pk)
+            seen.add(pk)
+        if duplicates:
+            errors.append(
+                f'{plural} повторяются: '
+                f'{", ".join(map(str, sorted(duplicates)))}.'
+            )
+        return objects, errors
+
     @atomic
     def create(self, validate_data):
         tags = validate_data.pop('tags')
@@ -212,15 +361,54 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @atomic
     def update(self, recipe, validate_data):
-        tags = validate_data.pop('tags')
-        ingredients = validate_data.pop('ingredients')
+        lock_recipes([recipe.pk])
+        tags = validate_data.pop('tags', None)
+        ingredients = validate_data.pop('ingredients', None)
         recipe = super().update(recipe, validate_data)
-        recipe.tags.set(tags)
-        recipe.ingredients_amount.all().delete()
-        self.create_ingredients(ingredients, recipe)
+        if tags is not None:
+            recipe.tags.set(tags)
+        if ingredients is not None:
+            ShoppingCartItem.apply(
+                recipe.shoppinglists.values_list('user_id', flat=True),
+                self.update_ingredients(recipe, ingredients)
+            )
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Приводит ингредиенты рецепта к ingredients, возвращает дельты."""
+        amounts = {}
+        for ingredient in ingredients:
+            pk = ingredient['id'].pk
+            amounts[pk] = amounts.get(pk, 0) + ingredient['amount']
+        rows, old_amounts, to_delete = {}, {}, []
+        for row in recipe.ingredients_amount.all():
+            old_amounts[row.ingredient_id] = (
+                old_amounts.get(row.ingredient_id, 0) + row.amount
+            )
+            if row.ingredient_id in rows or row.ingredient_id not in amounts:
+                to_delete.append(row.pk)
+            else:
+                rows[row.ingredient_id] = row
+        to_update = []
+        for pk, row in rows.items():
+            if row.amount != amounts[pk]:
+                row.amount = amounts[pk]
+                to_update.append(row)
+        to_create = [
+            IngredientOnRecipe(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in rows
+        ]
+        IngredientOnRecipe.objects.filter(pk__in=to_delete).delete()
+        IngredientOnRecipe.objects.bulk_update(to_update, ['amount'])
+        IngredientOnRecipe.objects.bulk_create(to_create)
+        return {
+            pk: amounts.get(pk, 0) - old_amounts.get(pk, 0)
+            for pk in amounts.keys() | old_amounts.keys()
+        }
+
     @staticmethod
     def create_ingredients(ingredients, recipe):
         ingredients = [
@@ -233,16 +421,21 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         IngredientOnRecipe.objects.bulk_create(ingredients)
 
     def to_representation(self, recipe):
+        prefetch_related_objects(
+            [recipe], *RecipeFragmentListSerializer.related
+        )
         return RecipeListSerializer(recipe, context=self.context).data
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор рецепта(укороченная версия)"""
     image = Base64ImageField(required=False, allow_null=True)
+    images = ImageRenditionsField()
 
     class Meta:
         model = Recipe
         fields = ('id',
                   'name',
                   'image',
+                  'images',
                   'cooking_time')
@@ -1,6 +1,13 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from hashlib import md5
+
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window, prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.db.transaction import atomic
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import viewsets
@@ -9,132 +16,380 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from api import serializers
+from api.bulk import (ABSENT, CREATED, DELETED, EXISTS, bulk_add, bulk_remove,
+                      bulk_statuses, get_bulk_ids, lock_recipes, lock_user,
+                      lock_users)
+from api.cache import CachedResponseMixin
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginator import CustomPagination
+from api.paginator import CustomPagination, KeysetPagination
 from api.permissions import IsAdminOrAuthorOrReadOnly
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientOnRecipe,
-                            Recipe, ShoppingList, Tag)
+from api.renderers import SHOPPING_LIST_RENDERERS
+from core.cache import get_versions, user_namespace, version_timestamp
+from core.constants import RECIPES_LIMIT
+from recipes.feed import feed_ids
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            ShoppingCartItem, ShoppingList, Tag)
+from recipes.signals import invalidate
 from users.models import Follow, User
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингридиентов"""
+    cache_namespaces = ('ingredients',)
     permission_classes = (AllowAny,)
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
     pagination_class = None
     filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тэгов"""
+    cache_namespaces = ('tags',)
     permission_classes = (AllowAny,)
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """Вьюсет рецептов"""
+    cache_namespaces = ('recipes',)
     permission_classes = (IsAdminOrAuthorOrReadOnly,)
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags',
-        'ingredients_amount',
-        'ingredients_amount__ingredient'
-    ).all()
+    queryset = Recipe.objects.defer('search_vector')
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    user_filter_params = ('is_favorited', 'is_in_shopping_cart')
+    popularity_params = ('ordering', 'min_favorites')
+    fragment_actions = ('list', 'feed')
+
+    @property
+    def paginator(self):
+        """Keyset-пагинация для ленты и запросов с параметром cursor."""
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if (self.action == 'feed' or KeysetPagination.cursor_query_param
+                    in self.request.query_params):
+                pagination_class = KeysetPagination
+            self._paginator = pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """Связи списка загружает RecipeFragmentListSerializer."""
+        queryset = super().get_queryset()
+        if self.action not in self.fragment_actions:
+            queryset = queryset.select_related('author').prefetch_related(
+                'tags',
+                'ingredients_amount',
+                'ingredients_amount__ingredient'
+            )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, following=OuterRef('author')
+            ))
+        )
+
+    def get_cache_namespaces(self, request):
+        """Порядок и фильтр по популярности зависят от избранного."""
+        if any(name in request.query_params
+               for name in self.popularity_params):
+            return (*self.cache_namespaces, 'popularity')
+        return self.cache_namespaces
+
+    def get_validators(self, request):
+        """Валидаторы без сериализации.
+
+        Для рецепта - его updated_at, для списка - версия рецептов;
+        у авторизованного пользователя к ним добавляется версия его
+        избранного, списка покупок и подписок.
+        """
+        versions = {}
+        if not request.user.is_anonymous:
+            versions = get_versions(user_namespace(request.user.pk))
+        if self.action == 'retrieve':
+            try:
+                updated_at = Recipe.objects.filter(
+                    pk=self.kwargs['pk']
+                ).values_list('updated_at', flat=True).first()
+            except (TypeError, ValueError):
+                return None
+            if updated_at is None:
+                return None
+            modified = [int(updated_at.timestamp())]
+            signature = (f'{request.build_absolute_uri("/")}'
+                         f'{self.kwargs["pk"]}:{updated_at.isoformat()}')
+        else:
+            versions.update(
+                get_versions(*self.get_cache_namespaces(request))
+            )
+            modified = []
+            signature = self.get_request_signature(request)
+        modified.extend(map(version_timestamp, versions.values()))
+        signature += f'#{sorted(versions.items())}'
+        etag = quote_etag(md5(signature.encode()).hexdigest())
+        return etag, max(modified)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return serializers.RecipeListSerializer
         return serializers.RecipeCreateSerializer
 
+    @atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        User.change_counter([self.request.user.pk], 'recipes_count', 1)
+
+    @atomic
+    def perform_destroy(self, recipe):
+        lock_recipes([recipe.pk])
+        ShoppingCartItem.remove_recipe(
+            list(recipe.shoppinglists.values_list('user_id', flat=True)),
+            recipe
+        )
+        recipe.delete()
+        User.change_counter([recipe.author_id], 'recipes_count', -1)
+
+    @action(detail=False,
+            methods=['GET'],
+            permission_classes=(IsAuthenticated,)
+            )
+    def feed(self, request):
+        """Рецепты авторов из подписок, от новых к старым."""
+        limit = self.paginator.get_page_size(request) + 1
+        recipes = self.get_queryset().filter(pk__in=feed_ids(
+            request.user, self.paginator.decode_cursor(request), limit
+        ))
+        page = self.paginate_queryset(recipes)
+        serializer = serializers.RecipeListSerializer(
+            page,
+            context=self.get_serializer_context(),
+            many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True,
             methods=['POST'],
             permission_classes=(IsAuthenticated,)
             )
+    @atomic
     def shopping_cart(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        ShoppingList.objects.create(
-            user=request.user,
-            recipe=recipe
+        _, _, created = self.change_recipes(
+            request, [recipe.pk], ShoppingList, 'shopping_carts_count',
+            add=True
         )
+        if not created:
+            return Response({'errors': 'Рецепт уже в списке покупок.'},
+                            status=400)
+        ShoppingCartItem.add_recipe([request.user.id], recipe)
         serializer = serializers.ShortRecipeSerializer(recipe)
         return Response(serializer.data, status=201)
 
     @shopping_cart.mapping.delete
+    @atomic
     def delete_shopping_cart(self, request, pk):
-        get_object_or_404(ShoppingList,
-                          recipe=pk,
-                          user=request.user).delete()
+        recipe = get_object_or_404(Recipe, id=pk)
+        _, _, deleted = self.change_recipes(
+            request, [recipe.pk], ShoppingList, 'shopping_carts_count',
+            add=False
+        )
+        if not deleted:
+            return Response({'errors': 'Рецепта нет в списке покупок.'},
+                            status=400)
+        ShoppingCartItem.remove_recipe([request.user.id], recipe)
         return Response(status=204)
 
     @action(detail=False,
             methods=['GET'],
-            permission_classes=(IsAuthenticated,)
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=SHOPPING_LIST_RENDERERS
             )
     def download_shopping_cart(self, request):
-        current_user = request.user
-        ingredients = IngredientOnRecipe.objects.filter(
-            recipe__shoppinglists__user=current_user
+        """Список покупок, формат выбирается параметром format."""
+        ingredients = ShoppingCartItem.objects.filter(
+            user=request.user
         ).values(
-            'ingredient__name', 'ingredient__meashurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        shopping_list = 'Список покупок\n'
-        for ingredient in ingredients:
-            shopping_list += (
-                f'{ingredient["ingredient__name"]}'
-                f'({ingredient["ingredient__meashurement_unit"]}) - '
-                f'{ingredient["total_amount"]}\n'
-            )
-        response = HttpResponse(shopping_list, 'Content-Type: text/plain')
-        response[
-            'Content-Dispoisition'
-        ] = 'attachement; filename="shopping_list.txt"'
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__meashurement_unit'),
+            amount=F('total_amount')
+        ).order_by('name')
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=renderer.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
         return response
 
     @action(detail=True,
             methods=['POST'],
             permission_classes=(IsAuthenticated,)
             )
+    @atomic
     def favorite(self, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        FavoriteRecipe.objects.create(
-            user=request.user,
-            recipe=recipe
+        _, _, created = self.change_recipes(
+            request, [recipe.pk], FavoriteRecipe, 'favorites_count',
+            add=True
         )
+        if not created:
+            return Response({'errors': 'Рецепт уже в избранном.'},
+                            status=400)
+        invalidate('popularity')
         serializer = serializers.ShortRecipeSerializer(recipe)
         return Response(serializer.data, status=201)
 
     @favorite.mapping.delete
+    @atomic
     def delete_favorite(self, request, pk):
-        get_object_or_404(FavoriteRecipe,
-                          recipe=pk,
-                          user=request.user).delete()
+        recipe = get_object_or_404(Recipe, id=pk)
+        _, _, deleted = self.change_recipes(
+            request, [recipe.pk], FavoriteRecipe, 'favorites_count',
+            add=False
+        )
+        if not deleted:
+            return Response({'errors': 'Рецепта нет в избранном.'},
+                            status=400)
         return Response(status=204)
 
+    def change_recipes(self, request, ids, relation, counter, add):
+        """Добавляет или удаляет рецепты ids из relation пользователя.
+
+        Строки рецептов и пользователя блокируются, а вставка идет с
+        ignore_conflicts (ON CONFLICT DO NOTHING), поэтому повторные и
+        параллельные запросы не падают на уникальном ограничении.
+        Возвращает id из запроса, найденные рецепты и рецепты, у которых
+        связь действительно изменилась.
+        """
+        found = lock_recipes(ids)
+        lock_user(request.user)
+        recipes = [pk for pk in ids if pk in found]
+        if add:
+            changed = bulk_add(relation, request.user, 'recipe', recipes)
+        else:
+            changed = bulk_remove(relation, request.user, 'recipe', recipes)
+        Recipe.change_counter(changed, counter, 1 if add else -1)
+        if changed:
+            invalidate(user_namespace(request.user.pk))
+        return ids, found, changed
+
+    @staticmethod
+    def get_bulk_recipes(request):
+        return get_bulk_ids(serializers.BulkRecipesSerializer,
+                            request.data, 'recipes')
+
+    @action(detail=False,
+            methods=['POST'],
+            url_path='favorite',
+            permission_classes=(IsAuthenticated,)
+            )
+    @atomic
+    def bulk_favorite(self, request):
+        """Добавление списка рецептов в избранное."""
+        ids, found, created = self.change_recipes(
+            request, self.get_bulk_recipes(request), FavoriteRecipe,
+            'favorites_count', add=True
+        )
+        if created:
+            invalidate('popularity')
+        return Response(bulk_statuses(ids, found, created, CREATED, EXISTS))
+
+    @bulk_favorite.mapping.delete
+    @atomic
+    def bulk_delete_favorite(self, request):
+        ids, found, deleted = self.change_recipes(
+            request, self.get_bulk_recipes(request), FavoriteRecipe,
+            'favorites_count', add=False
+        )
+        return Response(bulk_statuses(ids, found, deleted, DELETED, ABSENT))
+
+    @action(detail=False,
+            methods=['POST'],
+            url_path='shopping_cart',
+            permission_classes=(IsAuthenticated,)
+            )
+    @atomic
+    def bulk_shopping_cart(self, request):
+        """Добавление списка рецептов в список покупок."""
+        ids, found, created = self.change_recipes(
+            request, self.get_bulk_recipes(request), ShoppingList,
+            'shopping_carts_count', add=True
+        )
+        ShoppingCartItem.add_recipes([request.user.id], created)
+        return Response(bulk_statuses(ids, found, created, CREATED, EXISTS))
+
+    @bulk_shopping_cart.mapping.delete
+    @atomic
+    def bulk_delete_shopping_cart(self, request):
+        ids, found, deleted = self.change_recipes(
+            request, self.get_bulk_recipes(request), ShoppingList,
+            'shopping_carts_count', add=False
+        )
+        ShoppingCartItem.remove_recipes([request.user.id], deleted)
+        return Response(bulk_statuses(ids, found, deleted, DELETED, ABSENT))
+
 
 class UserViewSet(DjoserUserViewSet):
     """Вьюсет действий юзера"""
+    pagination_class = CustomPagination
+
+    def get_recipes_limit(self):
+        try:
+            return max(int(self.request.query_params['recipes_limit']), 0)
+        except (KeyError, ValueError):
+            return RECIPES_LIMIT
+
+    def prefetch_recipes(self, authors):
+        """Первые recipes_limit рецептов всех авторов одним запросом.
+
+        Рецепты нумеруются ROW_NUMBER() внутри каждого автора,
+        результат кладется в атрибут recipes_preview.
+        """
+        if not authors:
+            return
+        ranked = Recipe.objects.filter(author__in=authors).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=F('pub_date').desc()
+            )
+        ).values('pk', 'position')
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.position <= %s',
+            (*params, self.get_recipes_limit())
+        ))
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
+        )
 
     @action(detail=False,
             methods=['GET'],
             permission_classes=(IsAuthenticated,)
             )
     def subscriptions(self, request):
-        authors = User.objects.filter(
-            following__user=request.user
-        )
+        authors = User.objects.filter(following__user=request.user)
         page = self.paginate_queryset(authors)
+        self.prefetch_recipes(page)
         serializer = serializers.UserWithRecipesSerializer(
             page,
             context={'request': request},
@@ -146,12 +401,19 @@ class UserViewSet(DjoserUserViewSet):
             methods=['POST'],
             permission_classes=(IsAuthenticated,)
             )
+    @atomic
     def subscribe(self, request, id):
         author = get_object_or_404(User, pk=id)
-        Follow.objects.create(
-            user=request.user,
-            following=author
+        if author == request.user:
+            return Response({'errors': 'Нельзя подписаться на себя.'},
+                            status=400)
+        _, _, created = self.change_subscriptions(
+            request, [author.pk], add=True
         )
+        if not created:
+            return Response({'errors': 'Вы уже подписаны на автора.'},
+                            status=400)
+        self.prefetch_recipes([author])
         serializer = serializers.UserWithRecipesSerializer(
             author,
             context={'request': request}
@@ -159,6 +421,61 @@ class UserViewSet(DjoserUserViewSet):
         return Response(serializer.data, status=201)
 
     @subscribe.mapping.delete
+    @atomic
     def delete_subscribe(self, request, id):
-        get_object_or_404(Follow, user=request.user, following=id).delete()
+        author = get_object_or_404(User, pk=id)
+        _, _, deleted = self.change_subscriptions(
+            request, [author.pk], add=False
+        )
+        if not deleted:
+            return Response({'errors': 'Вы не подписаны на автора.'},
+                            status=400)
         return Response(status=204)
+
+    def change_subscriptions(self, request, ids, add):
+        """Оформляет или отменяет подписки на авторов ids.
+
+        Как и RecipeViewSet.change_recipes, безопасно при повторных и
+        параллельных запросах: пользователь и авторы блокируются вместе
+        по возрастанию id. Подписка на себя пропускается.
+        """
+        found = lock_users({request.user.pk, *ids}) & set(ids)
+        authors = [
+            pk for pk in ids if pk in found and pk != request.user.pk
+        ]
+        if add:
+            changed = bulk_add(Follow, request.user, 'following', authors)
+        else:
+            changed = bulk_remove(Follow, request.user, 'following', authors)
+        User.change_counter(changed, 'followers_count', 1 if add else -1)
+        if changed:
+            invalidate(user_namespace(request.user.pk))
+        return ids, found, changed
+
+    @staticmethod
+    def get_bulk_authors(request):
+        return get_bulk_ids(serializers.BulkAuthorsSerializer,
+                            request.data, 'authors')
+
+    @action(detail=False,
+            methods=['POST'],
+            url_path='subscribe',
+            permission_classes=(IsAuthenticated,)
+            )
+    @atomic
+    def bulk_subscribe(self, request):
+        """Подписка на список авторов."""
+        ids, found, created = self.change_subscriptions(
+            request, self.get_bulk_authors(request), add=True
+        )
+        return Response(bulk_statuses(ids, found, created, CREATED, EXISTS,
+                                      skipped={request.user.pk}))
+
+    @bulk_subscribe.mapping.delete
+    @atomic
+    def bulk_delete_subscribe(self, request):
+        ids, found, deleted = self.change_subscriptions(
+            request, self.get_bulk_authors(request), add=False
+        )
+        return Response(bulk_statuses(ids, found, deleted, DELETED, ABSENT,
+                                      skipped={request.user.pk}))
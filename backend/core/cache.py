@@ -0,0 +1,36 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def get_versions(*names):
+    """Текущие версии именованных данных ({имя: версия}).
+
+    Версия - время последнего изменения в наносекундах, поэтому она же
+    служит Last-Modified. Пропавшая из кеша версия получает текущее
+    время и не совпадает ни с одной из уже выданных.
+    """
+    keys = {VERSION_KEY.format(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_versions(*names):
+    now = time.time_ns()
+    cache.set_many({VERSION_KEY.format(name): now for name in names}, None)
+
+
+def version_timestamp(version):
+    """Версия в секундах Unix-времени (для Last-Modified)."""
+    return version // 10 ** 9
+
+
+def user_namespace(user_id):
+    """Версия данных, зависящих от пользователя (избранное, подписки)."""
+    return f'user:{user_id}'
@@ -2,6 +2,8 @@
 MAX_LENGTH_NAME_ING = 200
 MAX_LENGTH_MEASUREMENT_UNIT_ING = 200
 
+INGREDIENT_LOAD_BATCH_SIZE = 1000
+
 """Константы модели тега (Tag)"""
 MAX_LENGTH_NAME_TAG = 200
 MAX_LENGTH_COLOR_TAG = 7
@@ -11,6 +13,8 @@ MAX_LENGTH_SLUG_TAG = 200
 MAX_LENGTH_NAME_REC = 200
 MIN_COOKING_TIME_REC = 1
 MAX_COOKING_TIME_REC = 1440
+RECIPE_IMPORT_BATCH_SIZE = 1000
+RECIPE_EXPORT_CHUNK_SIZE = 2000
 
 """Константы модели ингредиента в рецепте (Ingredient On Recipe)"""
 MIN_AMOUNT_INGREDIENT_INREC = 1
@@ -24,3 +28,32 @@ MAX_LENGTH_LAST_NAME_USER = 150
 
 """Константы для DRF"""
 PAGINATION_PAGE_SIZE = 6
+RECIPES_LIMIT = 3
+INGREDIENT_SEARCH_LIMIT = 20
+COUNT_CACHE_TIMEOUT = 60
+COUNT_ESTIMATE_THRESHOLD = 10000
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+BULK_MAX_ITEMS = 100
+
+"""Константы обработки изображений"""
+IMAGE_RENDITIONS = {
+    'thumb': (160, 160),
+    'card': (600, 600),
+    'full': (1600, 1600),
+}
+IMAGE_QUALITY = 82
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_DECODE_CHUNK = 64 * 1024
+IMAGE_SPOOL_SIZE = 1024 * 1024
+IMAGE_GC_GRACE = 60 * 60 * 24
+
+"""Константы очереди задач (Job)"""
+MAX_LENGTH_TASK_JOB = 200
+MAX_LENGTH_KEY_JOB = 200
+MAX_LENGTH_STATUS_JOB = 20
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 30
+JOB_VISIBILITY_TIMEOUT = 60 * 5
+JOB_POLL_INTERVAL = 1
+JOB_WORKER_PROCESSES = 2
@@ -0,0 +1,29 @@
+from django.db.models import F
+
+
+class CounterFieldsMixin:
+    """Модель, чей save() не пишет счетчики, defer- и фоновые поля."""
+    counter_fields = ()
+    background_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            skipped = {
+                *self.counter_fields, *self.background_fields,
+                *self.get_deferred_fields(),
+            }
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+                and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def change_counter(cls, pks, field, delta=1):
+        """Атомарно меняет счетчик у объектов pks, не уходя ниже нуля."""
+        objects = cls.objects.filter(pk__in=pks)
+        if delta < 0:
+            objects = objects.filter(**{f'{field}__gte': -delta})
+        return objects.update(**{field: F(field) + delta})
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class RunPostgreSQL(migrations.RunSQL):
+    """RunSQL, выполняемый только на PostgreSQL.
+
+    Позволяет держать в миграциях специфичные для PostgreSQL индексы и
+    расширения, не ломая прогон миграций на SQLite.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
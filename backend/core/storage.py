@@ -0,0 +1,77 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+TEMP_PREFIX = '.tmp-'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - sha256 его содержимого.
+
+    Файл сохраняется как <каталог>/<aa>/<bb>/<sha256>.<расширение>, где
+    каталог - первая часть исходного имени (например, images). Одинаковое
+    содержимое всегда получает одно имя, поэтому повторная загрузка не
+    пишет на диск, а один файл могут использовать несколько записей.
+    Удалением неиспользуемых файлов занимается команда collect_images.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Обновляем mtime: сборщик мусора не тронет файл, на который
+            # вот-вот сошлется еще не закоммиченная запись.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = name.replace('\\', '/').split('/', 1)[0]
+        _, ext = posixpath.splitext(name)
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + ext.lower()
+        )
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        """Пишет во временный файл и атомарно переименовывает.
+
+        Параллельные загрузки одного содержимого пишут одинаковые байты,
+        поэтому замена уже появившегося файла безопасна.
+        """
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(
+                        chunk if isinstance(chunk, bytes) else chunk.encode()
+                    )
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+image_storage = ContentAddressedStorage()
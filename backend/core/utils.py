@@ -0,0 +1,11 @@
+from itertools import islice
+
+
+def batches(items, size):
+    """Разбивает поток items на списки не длиннее size."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,41 @@
+from django.contrib import admin
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'task',
+        'key',
+        'status',
+        'attempts',
+        'run_at',
+        'created_at',
+    )
+    list_display_links = (
+        'task',
+    )
+    search_fields = ('task', 'key')
+    list_filter = ('status', 'task')
+    readonly_fields = ('locked_until', 'last_error', 'created_at')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить упавшие задания')
+    @transaction.atomic
+    def retry(self, request, queryset):
+        """Упавшие задания с ключом, уже стоящим в очереди, удаляются."""
+        failed = queryset.filter(status=Job.FAILED)
+        failed.exclude(key='').filter(
+            Exists(Job.objects.filter(
+                key=OuterRef('key'), status=Job.QUEUED
+            ))
+            | Exists(failed.filter(key=OuterRef('key'), pk__gt=OuterRef('pk')))
+        ).delete()
+        failed.update(status=Job.QUEUED, attempts=0, run_at=timezone.now())
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,75 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.constants import JOB_POLL_INTERVAL, JOB_WORKER_PROCESSES
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = ('Запуск обработчиков фоновой очереди заданий в отдельных '
+            'процессах (без внешнего брокера, очередь хранится в базе)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=JOB_WORKER_PROCESSES,
+            help='Сколько процессов-обработчиков запустить',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выполнить готовые задания и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        # Соединения родителя не должны достаться дочерним процессам.
+        connections.close_all()
+        processes = [None] * options['processes']
+        while not stop.is_set():
+            for number, process in enumerate(processes):
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    if options['burst'] and process.exitcode == 0:
+                        continue
+                    self.stderr.write(
+                        f'Обработчик {number} завершился с кодом '
+                        f'{process.exitcode}, перезапуск'
+                    )
+                processes[number] = context.Process(
+                    target=self.worker, args=(stop, options['burst']),
+                    daemon=True,
+                )
+                processes[number].start()
+            if options['burst'] and not any(
+                process.is_alive() for process in processes
+            ):
+                break
+            stop.wait(JOB_POLL_INTERVAL)
+        for process in processes:
+            if process is not None:
+                process.join()
+
+    def worker(self, stop, burst):
+        # Ctrl+C получает вся группа процессов: останавливает родитель,
+        # дав обработчикам закончить текущее задание.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        work(stop, burst, self.log)
+
+    def log(self, job, succeeded):
+        if succeeded:
+            self.stdout.write(f'{job.task} {job.payload}: выполнено')
+        else:
+            self.stderr.write(
+                f'{job.task} {job.payload}: ошибка, попытка '
+                f'{job.attempts} из {job.max_attempts}'
+            )
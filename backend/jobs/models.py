@@ -0,0 +1,89 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from core.constants import (JOB_MAX_ATTEMPTS, MAX_LENGTH_KEY_JOB,
+                            MAX_LENGTH_STATUS_JOB, MAX_LENGTH_TASK_JOB)
+
+
+class Job(models.Model):
+    """Задание фоновой очереди.
+
+    Выполненные задания удаляются, в таблице остаются ожидающие,
+    выполняемые и упавшие после всех попыток.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        verbose_name='Задача',
+        max_length=MAX_LENGTH_TASK_JOB,
+    )
+    key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        max_length=MAX_LENGTH_KEY_JOB,
+        blank=True,
+        help_text='В очереди может быть только одно задание с таким ключом',
+    )
+    payload = models.JSONField(
+        verbose_name='Аргументы',
+        default=dict,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=MAX_LENGTH_STATUS_JOB,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=JOB_MAX_ATTEMPTS,
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Выполнить после',
+        default=timezone.now,
+    )
+    locked_until = models.DateTimeField(
+        verbose_name='Занято до',
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Задание'
+        verbose_name_plural = 'Задания'
+        ordering = ('run_at', 'id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=Q(status='queued') & ~Q(key=''),
+                name='unique_queued_job_key',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='job_status_run_at_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
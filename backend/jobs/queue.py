@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import tasks
+
+
+def enqueue(task, payload=None, key='', delay=0):
+    """Ставит задание в очередь в текущей транзакции.
+
+    Задание видно обработчикам только после коммита, вместе с данными,
+    которые его породили. Если в очереди уже ждет задание с тем же key,
+    новое не создается.
+    """
+    if tasks.get(getattr(task, 'task_name', None)) is not task:
+        raise ValueError(f'{task!r} не зарегистрирована как задача')
+    Job.objects.bulk_create(
+        [Job(
+            task=task.task_name,
+            key=key,
+            payload=payload or {},
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )],
+        ignore_conflicts=True,
+    )
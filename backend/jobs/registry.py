@@ -0,0 +1,12 @@
+tasks = {}
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу.
+
+    Задача получает аргументы из payload задания и должна быть
+    идемпотентной: при повторе после сбоя она выполняется еще раз.
+    """
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    tasks[func.task_name] = func
+    return func
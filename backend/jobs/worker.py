@@ -0,0 +1,102 @@
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.constants import (JOB_POLL_INTERVAL, JOB_RETRY_DELAY,
+                            JOB_VISIBILITY_TIMEOUT)
+from jobs.models import Job
+from jobs.registry import tasks
+
+
+def claim():
+    """Забирает одно готовое к выполнению задание.
+
+    Готовы задания в очереди, чье время пришло, и выполняемые, у которых
+    истек таймаут видимости (их обработчик завис или упал). Строки,
+    занятые другими обработчиками, пропускаются (SKIP LOCKED), поэтому
+    задание получает ровно один обработчик.
+    """
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            job = Job.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Job.QUEUED, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_until__lt=now)
+            ).order_by('run_at', 'id').first()
+            if job is None:
+                return None
+            if job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                job.last_error = 'Истек таймаут видимости'
+                job.save(update_fields=['status', 'last_error'])
+                continue
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_until = now + timedelta(
+                seconds=JOB_VISIBILITY_TIMEOUT
+            )
+            job.save(update_fields=['status', 'attempts', 'locked_until'])
+            return job
+
+
+def finish(job, error=None):
+    """Удаляет выполненное задание или планирует повтор упавшего.
+
+    Изменения применяются, только если задание все еще принадлежит
+    этому обработчику: после таймаута видимости его мог забрать другой.
+    """
+    owned = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+    )
+    if error is None:
+        owned.delete()
+        return
+    if job.attempts >= job.max_attempts:
+        owned.update(status=Job.FAILED, last_error=error)
+        return
+    delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+    try:
+        with transaction.atomic():
+            owned.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_until=None,
+                last_error=error,
+            )
+    except IntegrityError:
+        # В очереди уже ждет задание с тем же ключом - оно и выполнит
+        # работу заново.
+        owned.delete()
+
+
+def run(job):
+    try:
+        tasks[job.task](**job.payload)
+    except Exception:
+        finish(job, traceback.format_exc())
+        return False
+    finish(job)
+    return True
+
+
+def work(stop, burst=False, log=None):
+    """Цикл обработчика: выполняет задания, пока не выставлен stop.
+
+    В режиме burst завершается, когда готовых заданий не осталось.
+    """
+    while not stop.is_set():
+        close_old_connections()
+        job = claim()
+        if job is None:
+            if burst:
+                break
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        succeeded = run(job)
+        if log is not None:
+            log(job, succeeded)
+    close_old_connections()
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (FavoriteRecipe, Ingredient, IngredientOnRecipe, Recipe,
-                     ShoppingList, Tag)
+                     ShoppingCartItem, ShoppingList, Tag)
 
 
 class RecipeIngredientsInline(admin.TabularInline):
@@ -46,6 +46,7 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'cooking_time',
         'pub_date',
+        'favorites_count',
     )
     list_display_links = (
         'name',
@@ -91,9 +92,23 @@ class ShoppingListAdmin(admin.ModelAdmin):
     )
 
 
+class ShoppingCartItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'ingredient',
+        'total_amount',
+    )
+    list_display_links = (
+        'user',
+    )
+    list_filter = ('user',)
+
+
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(IngredientOnRecipe, IngredientOnRecipeAdmin)
 admin.site.register(FavoriteRecipe, FavoriteRecipeAdmin)
 admin.site.register(ShoppingList, ShoppingListAdmin)
+admin.site.register(ShoppingCartItem, ShoppingCartItemAdmin)
@@ -0,0 +1,62 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Recipe
+from users.models import Follow
+
+
+def seek(recipes, cursor):
+    """Рецепты строго после курсора (pub_date, id) в порядке -pub_date, -id.
+
+    Лишнее условие pub_date <= позволяет использовать индекс по pub_date.
+    """
+    if cursor is None:
+        return recipes
+    pub_date, pk = cursor
+    return recipes.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk),
+        pub_date__lte=pub_date
+    )
+
+
+def naive_feed_ids(user, cursor, limit):
+    """Лента одним запросом author__in - для сравнения и не-PostgreSQL."""
+    recipes = Recipe.objects.filter(
+        author__in=Follow.objects.filter(user=user).values('following')
+    )
+    return seek(recipes, cursor).order_by('-pub_date', '-id').values(
+        'pk'
+    )[:limit]
+
+
+def feed_ids(user, cursor, limit):
+    """Id рецептов ленты: limit последних рецептов авторов из подписок.
+
+    На PostgreSQL для каждой подписки берется не больше limit рецептов
+    автора проходом по индексу recipe_author_pub_date_idx (LATERAL),
+    после чего из k * limit строк выбираются limit последних. Запрос не
+    читает всю историю авторов, сколько бы их ни было в подписках.
+    """
+    if connections[Recipe.objects.db].vendor != 'postgresql':
+        return naive_feed_ids(user, cursor, limit)
+    seek_sql = ''
+    params = []
+    if cursor is not None:
+        seek_sql = 'AND (recipe.pub_date, recipe.id) < (%s, %s)'
+        params.extend(cursor)
+    sql = (
+        'SELECT page.id FROM {follow} follow '
+        'CROSS JOIN LATERAL ('
+        'SELECT recipe.id, recipe.pub_date FROM {recipe} recipe '
+        'WHERE recipe.author_id = follow.following_id {seek} '
+        'ORDER BY recipe.pub_date DESC, recipe.id DESC LIMIT %s'
+        ') page '
+        'WHERE follow.user_id = %s '
+        'ORDER BY page.pub_date DESC, page.id DESC LIMIT %s'
+    ).format(
+        follow=Follow._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        seek=seek_sql,
+    )
+    return RawSQL(sql, (*params, limit, user.pk, limit))
@@ -0,0 +1,159 @@
+import binascii
+import os
+import tempfile
+from base64 import b64decode
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.cache import bump_versions
+from core.constants import (IMAGE_DECODE_CHUNK, IMAGE_MAX_PIXELS,
+                            IMAGE_QUALITY, IMAGE_RENDITIONS, IMAGE_SPOOL_SIZE)
+from core.storage import image_storage
+from recipes.models import Recipe
+
+RENDITION_FORMATS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+
+class ImageError(ValueError):
+    """Загруженные данные не удалось разобрать как изображение."""
+
+
+def decode_base64(data):
+    """Декодирует base64 по частям во временный файл.
+
+    Вместо полной копии загрузки в памяти держится только текущая часть;
+    большие файлы уходят на диск.
+    """
+    chunk = IMAGE_DECODE_CHUNK - IMAGE_DECODE_CHUNK % 4
+    file = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+    try:
+        for start in range(0, len(data), chunk):
+            file.write(b64decode(data[start:start + chunk], validate=True))
+    except (binascii.Error, ValueError) as error:
+        file.close()
+        raise ImageError('Некорректная строка base64') from error
+    file.seek(0)
+    return file
+
+
+def open_image(file):
+    """Открывает изображение с учетом ориентации из EXIF, в RGB."""
+    try:
+        image = Image.open(file)
+        width, height = image.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ImageError('Слишком большое изображение')
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise ImageError('Файл не является изображением') from error
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode(image, image_format='jpeg'):
+    """Кодирует изображение заново, без EXIF и прочих метаданных."""
+    buffer = BytesIO()
+    if image_format == 'jpeg':
+        image.save(buffer, 'JPEG', quality=IMAGE_QUALITY, optimize=True,
+                   progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=IMAGE_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def fit(image, size):
+    """Уменьшает изображение до размера size, не увеличивая его."""
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def normalize_upload(data, name='image'):
+    """Оригинал из base64: без метаданных и не больше размера full."""
+    with decode_base64(data) as file:
+        image = open_image(file)
+    return ContentFile(
+        encode(fit(image, IMAGE_RENDITIONS['full'])), name=f'{name}.jpg'
+    )
+
+
+def rendition_path(source, size, image_format):
+    stem, _ = os.path.splitext(source)
+    return f'{stem}-{size}.{RENDITION_FORMATS[image_format]}'
+
+
+def build_renditions(source):
+    """Создает копии изображения source всех размеров и форматов.
+
+    Возвращает {размер: {формат: путь}} и путь оригинала в 'source'.
+    """
+    with image_storage.open(source, 'rb') as file:
+        image = open_image(file)
+    renditions = {'source': source}
+    for size, box in IMAGE_RENDITIONS.items():
+        resized = fit(image, box)
+        renditions[size] = {}
+        for image_format in RENDITION_FORMATS:
+            renditions[size][image_format] = image_storage.save(
+                rendition_path(source, size, image_format),
+                ContentFile(encode(resized, image_format)),
+            )
+    return renditions
+
+
+def generate_renditions(recipe_id):
+    """Готовит уменьшенные копии картинки рецепта.
+
+    Выполняется фоновой задачей и не держит транзакцию, пока идет
+    перекодирование. Если та же картинка уже есть у другого рецепта,
+    его копии используются повторно. Копии сохраняются, только если
+    картинка рецепта не сменилась за это время. Прежние копии могут
+    использоваться другими рецептами, их удаляет collect_images. Если
+    картинку не удалось прочитать, рецепт отдается без копий.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'image', 'image_renditions'
+    ).first()
+    if recipe is None:
+        return
+    source, previous = recipe['image'], recipe['image_renditions']
+    if previous.get('source') == source:
+        return
+    renditions = Recipe.objects.filter(
+        image=source, image_renditions__source=source
+    ).values_list('image_renditions', flat=True).first()
+    if renditions is None:
+        try:
+            renditions = (
+                build_renditions(source) if source else {'source': source}
+            )
+        except (ImageError, OSError):
+            renditions = {'source': source}
+    if Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_renditions=renditions, updated_at=timezone.now()
+    ):
+        bump_versions('recipes')
+
+
+def rendition_urls(recipe, request=None):
+    """Ссылки на копии картинки рецепта или None, пока их нет."""
+    renditions = recipe.image_renditions
+    if (not recipe.image or renditions.get('source') != recipe.image.name
+            or not all(size in renditions for size in IMAGE_RENDITIONS)):
+        return None
+    urls = {}
+    for size in IMAGE_RENDITIONS:
+        urls[size] = {}
+        for image_format, path in renditions[size].items():
+            url = image_storage.url(path)
+            urls[size][image_format] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
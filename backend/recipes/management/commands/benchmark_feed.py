@@ -0,0 +1,132 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.feed import feed_ids, naive_feed_ids
+from recipes.models import Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнение ленты подписок (LATERAL по индексу автора) '
+            'с наивным запросом author__in')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, для ленты которого мерить запросы',
+        )
+        parser.add_argument(
+            '--authors',
+            type=int,
+            default=0,
+            help='Создать подписчика на столько новых авторов '
+                 '(данные откатываются после замера)',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=50,
+            help='Рецептов у каждого созданного автора',
+        )
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Показать план первой страницы (EXPLAIN ANALYZE)',
+        )
+
+    def handle(self, *args, **options):
+        if options['user'] is None and not options['authors']:
+            raise CommandError('Укажите --user или --authors')
+        with transaction.atomic():
+            if options['authors']:
+                user = self.seed(options['authors'], options['recipes'])
+            else:
+                user = User.objects.get(pk=options['user'])
+            self.benchmark(user, options)
+            transaction.set_rollback(True)
+
+    def seed(self, authors, recipes):
+        self.stdout.write(f'Создание {authors} авторов по {recipes} рецептов')
+        suffix = time.time_ns()
+        User.objects.bulk_create(
+            User(
+                email=f'feed-{suffix}-{number}@example.com',
+                username=f'feed-{suffix}-{number}',
+                first_name='Автор',
+                last_name=str(number),
+                password='!',
+            )
+            for number in range(authors + 1)
+        )
+        users = list(User.objects.filter(
+            username__startswith=f'feed-{suffix}-'
+        ).order_by('pk'))
+        follower, authors = users[0], users[1:]
+        Follow.objects.bulk_create(
+            Follow(user=follower, following=author) for author in authors
+        )
+        for number in range(recipes):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f'Рецепт {number}',
+                    text='Текст',
+                    cooking_time=1,
+                )
+                for author in authors
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+                cursor.execute(f'ANALYZE {Follow._meta.db_table}')
+        return follower
+
+    def benchmark(self, user, options):
+        results = {}
+        for name, query in (('naive', naive_feed_ids), ('lateral', feed_ids)):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                pages = self.walk(user, query, options)
+                timings.append(time.perf_counter() - started)
+            results[name] = pages
+            self.stdout.write(
+                f'{name:8} {options["pages"]} стр. по {options["limit"]}: '
+                f'медиана {statistics.median(timings) * 1000:.1f} мс, '
+                f'мин {min(timings) * 1000:.1f} мс'
+            )
+            if options['explain'] and connection.vendor == 'postgresql':
+                self.explain(user, query, options['limit'])
+        if results['naive'] != results['lateral']:
+            raise CommandError('Результаты запросов различаются')
+        self.stdout.write(self.style.SUCCESS('Результаты совпадают'))
+
+    @staticmethod
+    def walk(user, query, options):
+        """Проходит pages страниц ленты, как клиент по курсору."""
+        pages = []
+        cursor = None
+        for _ in range(options['pages']):
+            page = list(
+                Recipe.objects.filter(
+                    pk__in=query(user, cursor, options['limit'])
+                ).order_by('-pub_date', '-id').values_list('pub_date', 'pk')
+            )
+            if not page:
+                break
+            pages.append([pk for _, pk in page])
+            cursor = page[-1]
+        return pages
+
+    def explain(self, user, query, limit):
+        recipes = Recipe.objects.filter(
+            pk__in=query(user, None, limit)
+        ).order_by('-pub_date', '-id').values('pk')
+        self.stdout.write(recipes.explain(analyze=True))
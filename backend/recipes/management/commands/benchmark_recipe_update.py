@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.serializers import RecipeCreateSerializer
+from recipes.models import Ingredient, IngredientOnRecipe, Recipe
+from users.models import User
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class WriteCounter:
+    """Считает запросы на запись и затронутые ими строки."""
+
+    def __init__(self):
+        self.statements = Counter()
+        self.rows = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        kind = sql.lstrip().split(' ', 1)[0].upper()
+        if kind in WRITES:
+            self.statements[kind] += 1
+            self.rows[kind] += max(context['cursor'].rowcount, 0)
+        return result
+
+
+class Command(BaseCommand):
+    help = ('Сравнение обновления ингредиентов рецепта: удаление и '
+            'пересоздание всех строк против обновления по разнице')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=30)
+        parser.add_argument(
+            '--changed',
+            type=int,
+            default=1,
+            help='Сколько ингредиентов меняет правка',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipe, ingredients = self.seed(options['ingredients'])
+            edited = [dict(item) for item in ingredients]
+            for item in edited[:options['changed']]:
+                item['amount'] += 1
+            for name, strategy in (('recreate', self.recreate),
+                                   ('diff', self.diff)):
+                self.measure(name, strategy, recipe, ingredients, edited,
+                             options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        suffix = time.time_ns()
+        author = User.objects.create(
+            email=f'update-{suffix}@example.com',
+            username=f'update-{suffix}',
+            first_name='Автор',
+            last_name='Автор',
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'update-{suffix}-{number}', meashurement_unit='г')
+            for number in range(count)
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст', cooking_time=1
+        )
+        ingredients = [
+            {'id': ingredient, 'amount': number + 1}
+            for number, ingredient in enumerate(Ingredient.objects.filter(
+                name__startswith=f'update-{suffix}-'
+            ).order_by('pk'))
+        ]
+        RecipeCreateSerializer.update_ingredients(recipe, ingredients)
+        return recipe, ingredients
+
+    def measure(self, name, strategy, recipe, original, edited, repeat):
+        counter = WriteCounter()
+        timings = []
+        for number in range(repeat):
+            target = edited if number % 2 == 0 else original
+            recipe = Recipe.objects.get(pk=recipe.pk)
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                strategy(recipe, target)
+            timings.append(time.perf_counter() - started)
+        statements = ', '.join(
+            f'{kind} {counter.statements[kind] / repeat:g}'
+            for kind in WRITES
+        )
+        rows = sum(counter.rows.values()) / repeat
+        self.stdout.write(
+            f'{name:9} запросов на запись за правку: {statements}; '
+            f'строк: {rows:g}; среднее {sum(timings) / repeat * 1000:.2f} мс'
+        )
+
+    @staticmethod
+    def recreate(recipe, ingredients):
+        """Прежняя стратегия: удалить все строки и создать заново."""
+        recipe.ingredients_amount.all().delete()
+        IngredientOnRecipe.objects.bulk_create(
+            IngredientOnRecipe(
+                recipe=recipe,
+                ingredient=item['id'],
+                amount=item['amount'],
+            ) for item in ingredients
+        )
+
+    @staticmethod
+    def diff(recipe, ingredients):
+        RecipeCreateSerializer.update_ingredients(recipe, ingredients)
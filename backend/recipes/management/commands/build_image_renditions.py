@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий картинок рецептов, у которых их '
+            'еще нет (например, загруженных до появления копий)')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('pk', flat=True)
+        for recipe_id in recipes.iterator():
+            generate_renditions(recipe_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено рецептов: {recipes.count()}'
+        ))
@@ -0,0 +1,70 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.constants import IMAGE_GC_GRACE, IMAGE_RENDITIONS
+from core.storage import image_storage
+from recipes.models import Recipe
+
+IMAGES_DIRECTORY = 'images'
+
+
+def image_references():
+    """Сколько рецептов ссылается на каждый файл картинки или копии."""
+    references = Counter()
+    recipes = Recipe.objects.values_list('image', 'image_renditions')
+    for image, renditions in recipes.iterator():
+        names = {image} if image else set()
+        for size in IMAGE_RENDITIONS:
+            names.update(renditions.get(size, {}).values())
+        references.update(names)
+    return references
+
+
+class Command(BaseCommand):
+    help = ('Удаление файлов из media/images, на которые не ссылается '
+            'ни один рецепт (ни картинкой, ни ее уменьшенными копиями)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=IMAGE_GC_GRACE,
+            help='Не трогать файлы моложе стольких секунд: на них могут '
+                 'ссылаться еще не закоммиченные изменения',
+        )
+
+    def handle(self, *args, **options):
+        references = image_references()
+        shared = sum(1 for count in references.values() if count > 1)
+        deadline = time.time() - options['grace']
+        root = image_storage.path(IMAGES_DIRECTORY)
+        kept = removed = freed = 0
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(
+                    path, image_storage.location
+                ).replace(os.sep, '/')
+                stat = os.stat(path)
+                if name in references or stat.st_mtime > deadline:
+                    kept += 1
+                    continue
+                removed += 1
+                freed += stat.st_size
+                if options['dry_run']:
+                    self.stdout.write(f'Удалить {name}')
+                else:
+                    os.remove(path)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed} ({freed / 2 ** 20:.1f} МБ), '
+            f'оставлено: {kept}, общих для нескольких рецептов: {shared}'
+        ))
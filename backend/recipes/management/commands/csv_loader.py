@@ -1,26 +1,203 @@
 import csv
+import io
+import json
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from core.cache import bump_versions
+from core.constants import (INGREDIENT_LOAD_BATCH_SIZE,
+                            MAX_LENGTH_MEASUREMENT_UNIT_ING,
+                            MAX_LENGTH_NAME_ING)
+from core.utils import batches
 from recipes.models import Ingredient
 
+DEFAULT_PATH = settings.BASE_DIR / 'static_data' / 'data' / 'ingredients.csv'
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=','):
+        if len(row) >= 2:
+            yield row[0], row[1]
+        else:
+            yield None
+
+
+def read_json(file):
+    """Потоково разбирает JSON-массив объектов {name, measurement_unit}.
+
+    Файл читается частями, в памяти держится только еще не разобранный
+    хвост, а не весь массив.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Ожидался JSON-массив')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON')
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if not isinstance(item, dict):
+            yield None
+            continue
+        yield item.get('name'), item.get(
+            'measurement_unit', item.get('meashurement_unit')
+        )
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+def clean(rows):
+    """Приводит строки к (name, unit), битые и слишком длинные - None."""
+    for row in rows:
+        if row is None or not all(isinstance(value, str) for value in row):
+            yield None
+            continue
+        name, unit = (value.strip() for value in row)
+        if (not name or not unit or len(name) > MAX_LENGTH_NAME_ING
+                or len(unit) > MAX_LENGTH_MEASUREMENT_UNIT_ING):
+            yield None
+            continue
+        yield name, unit
+
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов в БД'
-
-    def handle(self, *args, **kwargs):
-        file_path = (
-            settings.BASE_DIR / 'static_data' / 'data' / 'ingredients.csv')
-        with open(file_path, encoding='utf8') as file:
-            reader = csv.reader(file, delimiter=',')
-            Ingredient.objects.all().delete()
-            ingredients = []
-            for row in reader:
-                name, meashurement_unit = row
-                ingredients.append(Ingredient(
-                    name=name,
-                    meashurement_unit=meashurement_unit))
-            Ingredient.objects.bulk_create(ingredients)
-
-        print('Загрузка в БД прошла успешно')
+    help = ('Загрузка каталога ингредиентов из CSV или JSON: потоково, '
+            'пачками, с добавлением только новых ингредиентов (по '
+            'уникальности названия и единицы измерения). Существующие '
+            'ингредиенты и рецепты не затрагиваются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(DEFAULT_PATH),
+            help='CSV (название,единица) или JSON '
+                 '([{"name", "measurement_unit"}])',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INGREDIENT_LOAD_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать изменения, ничего не записывать',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        load = (
+            self.load_batches
+            if options['no_copy'] or connection.vendor != 'postgresql'
+            else self.load_copy
+        )
+        with open(path, encoding='utf8') as file, transaction.atomic():
+            stats = load(
+                batches(clean(reader(file)), options['batch_size'])
+            )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        if stats['inserted'] and not options['dry_run']:
+            bump_versions('ingredients')
+        action = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: {stats["inserted"]}, '
+            f'уже в каталоге: {stats["unchanged"]}, '
+            f'пропущено некорректных строк: {stats["skipped"]}'
+        ))
+
+    @staticmethod
+    def split(batch):
+        """Корректные строки пачки без повторов и число пропущенных."""
+        rows = [row for row in batch if row is not None]
+        return list(dict.fromkeys(rows)), len(batch) - len(rows)
+
+    def load_batches(self, row_batches):
+        """Пачками: ищет уже существующие и вставляет только новые."""
+        stats = dict(inserted=0, unchanged=0, skipped=0)
+        for batch in row_batches:
+            rows, skipped = self.split(batch)
+            stats['skipped'] += skipped
+            existing = set(Ingredient.objects.filter(
+                name__in={name for name, _ in rows}
+            ).values_list('name', 'meashurement_unit'))
+            new = [row for row in rows if row not in existing]
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, meashurement_unit=unit)
+                 for name, unit in new],
+                ignore_conflicts=True,
+            )
+            stats['inserted'] += len(new)
+            stats['unchanged'] += len(rows) - len(new)
+        return stats
+
+    def load_copy(self, row_batches):
+        """PostgreSQL: COPY во временную таблицу и один INSERT ... SELECT.
+
+        Пачки только потоково пишутся в staging; сопоставление с
+        каталогом и вставка идут одним запросом по unique_ingredient_name.
+        """
+        table = Ingredient._meta.db_table
+        stats = dict(inserted=0, unchanged=0, skipped=0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging '
+                '(name text, meashurement_unit text) ON COMMIT DROP'
+            )
+            for batch in row_batches:
+                rows, skipped = self.split(batch)
+                stats['skipped'] += skipped
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_staging (name, meashurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer
+                )
+            cursor.execute(
+                'SELECT count(*) FROM (SELECT DISTINCT name, '
+                'meashurement_unit FROM ingredient_staging) AS staged'
+            )
+            staged = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} (name, meashurement_unit) '
+                f'SELECT DISTINCT name, meashurement_unit '
+                f'FROM ingredient_staging '
+                f'ON CONFLICT ON CONSTRAINT unique_ingredient_name '
+                f'DO NOTHING'
+            )
+            stats['inserted'] = cursor.rowcount
+        stats['unchanged'] = staged - stats['inserted']
+        return stats
@@ -0,0 +1,84 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core.constants import RECIPE_EXPORT_CHUNK_SIZE
+from core.utils import batches
+from recipes.models import IngredientOnRecipe, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Выгрузка рецептов с тегами, ингредиентами и ссылками на '
+            'картинки в JSONL (один рецепт на строку) для import_recipes')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            default='-',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECIPE_EXPORT_CHUNK_SIZE,
+            help='Сколько рецептов читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            exported = self.export(
+                lambda line: self.stdout.write(line, ending=''),
+                options['chunk_size'],
+            )
+        else:
+            with open(options['output'], 'w', encoding='utf8') as file:
+                exported = self.export(file.write, options['chunk_size'])
+        self.stderr.write(f'Выгружено рецептов: {exported}')
+
+    def export(self, write, chunk_size):
+        recipes = Recipe.objects.order_by('pk').values(
+            'pk', 'name', 'text', 'cooking_time', 'pub_date',
+            'author__email', 'image', 'image_renditions',
+        ).iterator(chunk_size=chunk_size)
+        exported = 0
+        for chunk in batches(recipes, chunk_size):
+            tags, ingredients = self.related([row['pk'] for row in chunk])
+            for row in chunk:
+                write(json.dumps({
+                    'name': row['name'],
+                    'text': row['text'],
+                    'cooking_time': row['cooking_time'],
+                    'pub_date': row['pub_date'].isoformat(),
+                    'author': row['author__email'],
+                    'image': row['image'] or None,
+                    'images': row['image_renditions'],
+                    'tags': tags[row['pk']],
+                    'ingredients': ingredients[row['pk']],
+                }, ensure_ascii=False) + '\n')
+            exported += len(chunk)
+        return exported
+
+    @staticmethod
+    def related(recipe_ids):
+        """Теги и ингредиенты рецептов пачки: по одному запросу на вид.
+
+        prefetch_related не работает вместе с iterator(), поэтому
+        связанные данные выбираются отдельно для каждой пачки.
+        """
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in IngredientOnRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__meashurement_unit',
+            'amount',
+        ):
+            ingredients[recipe_id].append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+            )
+        return tags, ingredients
@@ -0,0 +1,231 @@
+import json
+import sys
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from core.cache import bump_versions
+from core.constants import (MAX_COOKING_TIME_REC, MAX_LENGTH_NAME_REC,
+                            MIN_AMOUNT_INGREDIENT_INREC, MIN_COOKING_TIME_REC,
+                            RECIPE_IMPORT_BATCH_SIZE)
+from core.utils import batches
+from jobs.queue import enqueue
+from recipes.models import Ingredient, IngredientOnRecipe, Recipe, Tag
+from recipes.search import update_search_vector
+from recipes.tasks import build_image_renditions
+from users.models import User
+
+
+def validate(record):
+    """Проверяет запись из JSONL и приводит ее к нужным типам."""
+    if not isinstance(record, dict):
+        raise ValueError('ожидался объект')
+    name, text = record.get('name'), record.get('text')
+    if not isinstance(name, str) or not 0 < len(name) <= MAX_LENGTH_NAME_REC:
+        raise ValueError('некорректное название')
+    if not isinstance(text, str) or not text:
+        raise ValueError('нет описания')
+    cooking_time = record.get('cooking_time')
+    if (not isinstance(cooking_time, int)
+            or not MIN_COOKING_TIME_REC <= cooking_time
+            <= MAX_COOKING_TIME_REC):
+        raise ValueError('некорректное время приготовления')
+    if not isinstance(record.get('author'), str):
+        raise ValueError('не указан автор')
+    tags = record.get('tags', [])
+    if not isinstance(tags, list) or not all(
+        isinstance(slug, str) for slug in tags
+    ):
+        raise ValueError('теги должны быть списком слагов')
+    items = record.get('ingredients', [])
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict) for item in items
+    ):
+        raise ValueError('ингредиенты должны быть списком объектов')
+    ingredients = Counter()
+    for item in items:
+        key = (item.get('name'), item.get('measurement_unit'))
+        amount = item.get('amount')
+        if (not all(isinstance(value, str) and value for value in key)
+                or not isinstance(amount, int)
+                or amount < MIN_AMOUNT_INGREDIENT_INREC):
+            raise ValueError('некорректный ингредиент')
+        ingredients[key] += amount
+    pub_date = record.get('pub_date')
+    if pub_date is not None:
+        pub_date = parse_datetime(pub_date)
+        if pub_date is None:
+            raise ValueError('некорректная дата публикации')
+    image = record.get('image') or None
+    images = record.get('images') or {}
+    return {
+        'name': name,
+        'text': text,
+        'cooking_time': cooking_time,
+        'author': record['author'],
+        'tags': list(dict.fromkeys(tags)),
+        'ingredients': ingredients,
+        'pub_date': pub_date,
+        'image': image,
+        # Копии картинки переносятся, только если построены для нее же.
+        'images': images if images.get('source') == image else {},
+    }
+
+
+class Command(BaseCommand):
+    help = ('Загрузка рецептов из JSONL (формат export_recipes) пачками '
+            'через bulk_create, каждая пачка в своей транзакции')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл JSONL или "-" для чтения из stdin',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPE_IMPORT_BATCH_SIZE,
+            help='Сколько рецептов записывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        self.stats = Counter()
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        if options['path'] == '-':
+            self.load(sys.stdin, options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf8') as file:
+                self.load(file, options['batch_size'])
+        if self.stats['ingredients']:
+            bump_versions('ingredients')
+        if self.stats['imported']:
+            bump_versions('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {self.stats["imported"]}, '
+            f'новых ингредиентов: {self.stats["ingredients"]}, '
+            f'пропущено строк: {self.stats["skipped"]}'
+        ))
+
+    def load(self, file, batch_size):
+        for batch in batches(self.parse(file), batch_size):
+            with transaction.atomic():
+                self.import_batch(batch)
+
+    def parse(self, file):
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, validate(json.loads(line))
+            except ValueError as error:
+                self.skip(number, error)
+
+    def skip(self, number, reason):
+        self.stats['skipped'] += 1
+        self.stderr.write(f'Строка {number} пропущена: {reason}')
+
+    def import_batch(self, batch):
+        authors = User.objects.in_bulk(
+            {record['author'] for _, record in batch}, field_name='email'
+        )
+        records = []
+        for number, record in batch:
+            unknown = [
+                slug for slug in record['tags'] if slug not in self.tags
+            ]
+            if record['author'] not in authors:
+                self.skip(number, f'нет автора {record["author"]}')
+            elif unknown:
+                self.skip(number, f'нет тегов {", ".join(unknown)}')
+            else:
+                records.append(record)
+        if not records:
+            return
+        ingredients = self.resolve_ingredients(records)
+        recipes = [
+            Recipe(
+                author=authors[record['author']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                image_renditions=record['images'],
+            ) for record in records
+        ]
+        self.create_recipes(recipes)
+        dated = []
+        for recipe, record in zip(recipes, records):
+            if record['pub_date'] is not None:
+                recipe.pub_date = record['pub_date']
+                dated.append(recipe)
+        Recipe.objects.bulk_update(dated, ['pub_date'])
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=self.tags[slug])
+            for recipe, record in zip(recipes, records)
+            for slug in record['tags']
+        )
+        IngredientOnRecipe.objects.bulk_create(
+            IngredientOnRecipe(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredients[key],
+                amount=amount,
+            )
+            for recipe, record in zip(recipes, records)
+            for key, amount in record['ingredients'].items()
+        )
+        self.update_side_effects(recipes)
+        self.stats['imported'] += len(recipes)
+
+    def resolve_ingredients(self, records):
+        """{(название, единица): id}, недостающие добавляются в каталог."""
+        keys = {key for record in records for key in record['ingredients']}
+        ingredients = self.find_ingredients(keys)
+        missing = keys - ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, meashurement_unit=unit)
+                 for name, unit in missing],
+                ignore_conflicts=True,
+            )
+            ingredients.update(self.find_ingredients(missing))
+            self.stats['ingredients'] += len(missing)
+        return ingredients
+
+    @staticmethod
+    def find_ingredients(keys):
+        found = Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).values_list('name', 'meashurement_unit', 'pk')
+        return {
+            (name, unit): pk for name, unit, pk in found
+            if (name, unit) in keys
+        }
+
+    @staticmethod
+    def create_recipes(recipes):
+        """Вставляет рецепты одним запросом там, где база вернет их id.
+
+        Иначе (SQLite) рецепты сохраняются по одному, как через API.
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+
+    @staticmethod
+    def update_side_effects(recipes):
+        """То, что при создании через API делают представление и сигналы."""
+        authors = Counter(recipe.author_id for recipe in recipes)
+        by_delta = defaultdict(list)
+        for author_id, delta in authors.items():
+            by_delta[delta].append(author_id)
+        for delta, author_ids in by_delta.items():
+            User.change_counter(author_ids, 'recipes_count', delta)
+        update_search_vector([recipe.pk for recipe in recipes])
+        for recipe in recipes:
+            if recipe.image and not recipe.image_renditions:
+                enqueue(build_image_renditions, {'recipe_id': recipe.pk},
+                        key=f'renditions:{recipe.pk}')
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'shopping_carts_count', ShoppingList, 'recipe'),
+    (User, 'followers_count', Follow, 'following'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сверка денормализованных счетчиков (favorites_count, '
+            'shopping_carts_count, followers_count, recipes_count) '
+            'с фактическими данными и исправление расхождений')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+        )
+
+    def handle(self, *args, **options):
+        drift = 0
+        for model, field, related, foreign_key in COUNTERS:
+            drift += self.reconcile(
+                model, field, related, foreign_key,
+                options['dry_run'], options['batch_size']
+            )
+        if drift and options['dry_run']:
+            raise CommandError(f'Расхождений: {drift}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {drift}' if drift
+            else 'Расхождений нет'
+        ))
+
+    @staticmethod
+    def actual(related, foreign_key):
+        return Coalesce(Subquery(
+            related.objects.filter(
+                **{foreign_key: OuterRef('pk')}
+            ).order_by().values(foreign_key).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+
+    def reconcile(self, model, field, related, foreign_key, dry_run,
+                  batch_size):
+        actual = self.actual(related, foreign_key)
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', field, 'actual').order_by('pk')
+        pks = []
+        for pk, stored, expected in drifted.iterator():
+            self.stdout.write(
+                f'{model._meta.model_name}={pk} {field}: '
+                f'{stored} вместо {expected}'
+            )
+            pks.append(pk)
+        if dry_run:
+            return len(pks)
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                model.objects.filter(
+                    pk__in=pks[start:start + batch_size]
+                ).update(**{field: actual})
+        return len(pks)
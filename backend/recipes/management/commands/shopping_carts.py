@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.models import IngredientOnRecipe, ShoppingCartItem
+
+
+class Command(BaseCommand):
+    help = ('Проверка (по умолчанию) или пересборка сумм ингредиентов '
+            'в списках покупок (ShoppingCartItem)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересобрать суммы заново из рецептов в списках покупок',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Ограничиться пользователем с указанным id',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if options['rebuild']:
+            self.rebuild(users, options['batch_size'])
+            return
+        drift = self.verify(users)
+        if drift:
+            raise CommandError(
+                f'Расхождений: {drift}. Запустите команду с --rebuild'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+
+    @staticmethod
+    def expected(users):
+        if users:
+            lookup = {'recipe__shoppinglists__user__in': users}
+        else:
+            lookup = {'recipe__shoppinglists__isnull': False}
+        return IngredientOnRecipe.objects.filter(**lookup).values(
+            'ingredient_id', user_id=F('recipe__shoppinglists__user')
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by().iterator()
+
+    def verify(self, users):
+        items = ShoppingCartItem.objects.all()
+        if users:
+            items = items.filter(user__in=users)
+        actual = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in items.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        drift = 0
+        for row in self.expected(users):
+            key = (row['user_id'], row['ingredient_id'])
+            total_amount = actual.pop(key, 0)
+            if total_amount != row['total_amount']:
+                drift += 1
+                self.stdout.write(
+                    f'user={key[0]} ingredient={key[1]}: '
+                    f'{total_amount} вместо {row["total_amount"]}'
+                )
+        for (user_id, ingredient_id), total_amount in actual.items():
+            drift += 1
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'{total_amount} вместо 0'
+            )
+        return drift
+
+    @transaction.atomic
+    def rebuild(self, users, batch_size):
+        items = ShoppingCartItem.objects.all()
+        if users:
+            items = items.filter(user__in=users)
+        items.delete()
+        batch = []
+        created = 0
+        for row in self.expected(users):
+            batch.append(ShoppingCartItem(**row))
+            if len(batch) == batch_size:
+                ShoppingCartItem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingCartItem.objects.bulk_create(batch)
+        created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, строк: {created}'
+        ))
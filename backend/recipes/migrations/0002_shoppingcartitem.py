@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_cart_items(apps, schema_editor):
+    IngredientOnRecipe = apps.get_model('recipes', 'IngredientOnRecipe')
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    rows = IngredientOnRecipe.objects.filter(
+        recipe__shoppinglists__isnull=False
+    ).values(
+        'ingredient_id', user_id=models.F('recipe__shoppinglists__user')
+    ).annotate(total_amount=models.Sum('amount')).order_by()
+    ShoppingCartItem.objects.bulk_create(
+        (ShoppingCartItem(**row) for row in rows), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Общее количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_item'),
+        ),
+        migrations.RunPython(fill_shopping_cart_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from core.operations import RunPostgreSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppingcartitem'),
+    ]
+
+    operations = [
+        RunPostgreSQL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+            migrations.RunSQL.noop,
+        ),
+        RunPostgreSQL(
+            'CREATE INDEX recipes_ingredient_name_prefix '
+            'ON recipes_ingredient (UPPER(name) text_pattern_ops);',
+            'DROP INDEX recipes_ingredient_name_prefix;',
+        ),
+        RunPostgreSQL(
+            'CREATE INDEX recipes_ingredient_name_trgm '
+            'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops);',
+            'DROP INDEX recipes_ingredient_name_trgm;',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:36
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from core.operations import RunPostgreSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        RunPostgreSQL(
+            "UPDATE recipes_recipe SET search_vector = "
+            "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', COALESCE(text, '')), 'B');",
+            migrations.RunSQL.noop,
+        ),
+        RunPostgreSQL(
+            'CREATE INDEX recipes_recipe_search_vector '
+            'ON recipes_recipe USING gin (search_vector);',
+            'DROP INDEX recipes_recipe_search_vector;',
+        ),
+    ]
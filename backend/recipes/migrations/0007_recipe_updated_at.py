@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            'UPDATE recipes_recipe SET updated_at = pub_date',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_updated_at'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunSQL(
+            'UPDATE recipes_recipe SET favorites_count = ('
+            'SELECT COUNT(*) FROM recipes_favoriterecipe '
+            'WHERE recipes_favoriterecipe.recipe_id = recipes_recipe.id), '
+            'shopping_carts_count = ('
+            'SELECT COUNT(*) FROM recipes_shoppinglist '
+            'WHERE recipes_shoppinglist.recipe_id = recipes_recipe.id)',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'UPDATE users_user SET recipes_count = ('
+            'SELECT COUNT(*) FROM recipes_recipe '
+            'WHERE recipes_recipe.author_id = users_user.id)',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:59
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='images/', verbose_name='Ссылка на картинку на сайте'),
+        ),
+    ]
@@ -1,6 +1,7 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db import models
+from django.db import models, transaction
 
 from core.constants import (DEFAULT_AMOUNT_INGREDIENT_INREC,
                             MAX_COOKING_TIME_REC, MAX_LENGTH_COLOR_TAG,
@@ -8,6 +9,8 @@ from core.constants import (DEFAULT_AMOUNT_INGREDIENT_INREC,
                             MAX_LENGTH_NAME_ING, MAX_LENGTH_NAME_REC,
                             MAX_LENGTH_NAME_TAG, MAX_LENGTH_SLUG_TAG,
                             MIN_AMOUNT_INGREDIENT_INREC, MIN_COOKING_TIME_REC)
+from core.models import CounterFieldsMixin
+from core.storage import image_storage
 from users.models import User
 
 
@@ -67,7 +70,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Список тегов',
@@ -92,7 +95,15 @@ class Recipe(models.Model):
         verbose_name='Ссылка на картинку на сайте',
         blank=True,
         null=True,
-        upload_to='images/%Y/%m/%d',
+        upload_to='images/',
+        storage=image_storage,
+        db_index=True,
+    )
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
     )
     text = models.TextField(
         verbose_name='Описание',
@@ -113,15 +124,74 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count', 'shopping_carts_count')
+    background_fields = ('search_vector', 'image_renditions')
+    search_fields = ('name', 'text')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_count_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        recipe.remember_search_fields()
+        return recipe
+
+    def remember_search_fields(self):
+        """Запоминает name и text, из которых строится search_vector."""
+        self._saved_search_fields = {
+            name: self.__dict__[name]
+            for name in self.search_fields if name in self.__dict__
+        }
+
+    def search_fields_changed(self):
+        saved = getattr(self, '_saved_search_fields', {})
+        return any(
+            name in self.__dict__ and (
+                name not in saved or saved[name] != self.__dict__[name]
+            )
+            for name in self.search_fields
+        )
+
 
 class IngredientOnRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -157,6 +227,12 @@ class IngredientOnRecipe(models.Model):
                 name='unique_ingredient',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='ingredient_recipe_idx',
+            )
+        ]
 
     def __str__(self):
         return f'{self.ingredient.name} - {self.amount}'
@@ -206,3 +282,122 @@ class ShoppingList(BaseRecipe):
                 name='unique_user_recipe',
             )
         ]
+
+
+class ShoppingCartItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Денормализация IngredientOnRecipe x ShoppingList: обновляется при
+    добавлении/удалении рецепта из списка покупок и при изменении
+    ингредиентов рецепта, который лежит в чьих-то списках.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_item',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        return dict(
+            recipe.ingredients_amount.values_list('ingredient_id', 'amount')
+        )
+
+    @staticmethod
+    def recipes_amounts(recipe_ids):
+        """Суммы ингредиентов нескольких рецептов одним запросом."""
+        return dict(
+            IngredientOnRecipe.objects.filter(
+                recipe__in=recipe_ids
+            ).values('ingredient_id').annotate(
+                total=models.Sum('amount')
+            ).order_by().values_list('ingredient_id', 'total')
+        )
+
+    @classmethod
+    def add_recipe(cls, user_ids, recipe):
+        cls.apply(user_ids, cls.recipe_amounts(recipe))
+
+    @classmethod
+    def add_recipes(cls, user_ids, recipe_ids):
+        cls.apply(user_ids, cls.recipes_amounts(recipe_ids))
+
+    @classmethod
+    def remove_recipe(cls, user_ids, recipe):
+        cls.apply(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount in cls.recipe_amounts(recipe).items()
+        })
+
+    @classmethod
+    def remove_recipes(cls, user_ids, recipe_ids):
+        cls.apply(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount
+            in cls.recipes_amounts(recipe_ids).items()
+        })
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, user_ids, amounts):
+        """Прибавляет amounts ({id ингредиента: дельта}) к спискам users.
+
+        Строки пользователей блокируются, чтобы параллельные изменения
+        одного списка покупок выполнялись последовательно.
+        """
+        amounts = {key: value for key, value in amounts.items() if value}
+        user_ids = list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        if not user_ids or not amounts:
+            return
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in cls.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(cls(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=amount,
+                        ))
+                    continue
+                item.total_amount += amount
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        cls.objects.bulk_create(to_create)
+        cls.objects.bulk_update(to_update, ['total_amount'])
+        cls.objects.filter(pk__in=to_delete).delete()
@@ -0,0 +1,74 @@
+from bisect import bisect_left
+
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+
+from core.cache import get_versions
+from recipes.models import Ingredient, Recipe
+
+SEARCH_CONFIG = 'russian'
+
+
+class IngredientIndex:
+    """Отсортированный по casefold-названию каталог ингредиентов.
+
+    Совпадения по началу названия ищутся бинпоиском, по вхождению -
+    линейным проходом по уже приведенным к casefold названиям.
+    """
+
+    def __init__(self, ingredients):
+        self.ingredients = sorted(
+            ingredients,
+            key=lambda ingredient: (ingredient.name.casefold(),
+                                    ingredient.pk)
+        )
+        self.keys = [
+            ingredient.name.casefold() for ingredient in self.ingredients
+        ]
+
+    def search(self, name, limit):
+        name = name.casefold()
+        found = []
+        position = bisect_left(self.keys, name)
+        while (position < len(self.keys) and len(found) < limit
+               and self.keys[position].startswith(name)):
+            found.append(self.ingredients[position])
+            position += 1
+        for key, ingredient in zip(self.keys, self.ingredients):
+            if len(found) >= limit:
+                break
+            if name in key and not key.startswith(name):
+                found.append(ingredient)
+        return found
+
+
+_index = (None, None)
+
+
+def get_ingredient_index():
+    """Индекс текущего процесса, перестраивается при смене версии."""
+    global _index
+    version = get_versions('ingredients')['ingredients']
+    index_version, index = _index
+    if index is None or index_version != version:
+        index = IngredientIndex(Ingredient.objects.all())
+        _index = (version, index)
+    return index
+
+
+def recipe_search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(recipes):
+    """Пересчитывает search_vector рецептов (только на PostgreSQL).
+
+    Возвращает число обновленных рецептов.
+    """
+    recipes = Recipe.objects.filter(pk__in=recipes)
+    if connections[recipes.db].vendor != 'postgresql':
+        return 0
+    return recipes.update(search_vector=recipe_search_vector())
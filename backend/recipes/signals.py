@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import bump_versions, user_namespace
+from jobs.queue import enqueue
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientOnRecipe,
+                            Recipe, ShoppingList, Tag)
+from recipes.tasks import build_image_renditions, refresh_search_vector
+from users.models import Follow, User
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def invalidate(*names):
+    """Сбрасывает кеш после коммита, чтобы не закешировать старые данные."""
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+def touch(recipes):
+    """Обновляет updated_at рецептов, чье представление изменилось."""
+    Recipe.objects.filter(pk__in=recipes).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created, **kwargs):
+    if not created:
+        touch(instance.ingredients_amount.values('recipe'))
+    invalidate('ingredients', 'recipes')
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(**kwargs):
+    invalidate('ingredients', 'recipes')
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(instance, created, **kwargs):
+    if not created:
+        touch(instance.recipes.values('pk'))
+    invalidate('tags', 'recipes')
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    touch(instance.recipes.values('pk'))
+    invalidate('tags', 'recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, update_fields, **kwargs):
+    payload = {'recipe_id': instance.pk}
+    if instance.search_fields_changed() and (
+        update_fields is None
+        or set(instance.search_fields) & set(update_fields)
+    ):
+        enqueue(refresh_search_vector, payload,
+                key=f'search_vector:{instance.pk}')
+        instance.remember_search_fields()
+    if instance.image.name != instance.image_renditions.get('source'):
+        enqueue(build_image_renditions, payload,
+                key=f'renditions:{instance.pk}')
+    invalidate('recipes')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(**kwargs):
+    invalidate('recipes')
+
+
+@receiver(post_save, sender=IngredientOnRecipe)
+@receiver(post_delete, sender=IngredientOnRecipe)
+def recipe_ingredient_changed(instance, **kwargs):
+    touch([instance.recipe_id])
+    invalidate('recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch([instance.pk])
+    elif pk_set is not None:
+        touch(pk_set)
+    else:
+        touch(instance.recipes.values('pk'))
+    invalidate('recipes')
+
+
+@receiver(post_save, sender=User)
+def author_saved(instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        touch(instance.recipes.values('pk'))
+        invalidate('recipes')
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_changed(instance, **kwargs):
+    invalidate('popularity', user_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def user_state_changed(instance, **kwargs):
+    invalidate(user_namespace(instance.user_id))
@@ -0,0 +1,16 @@
+from core.cache import bump_versions
+from jobs.registry import task
+from recipes.images import generate_renditions
+from recipes.search import update_search_vector
+
+
+@task
+def refresh_search_vector(recipe_id):
+    """Ответы с ?search= закешированы: новый вектор сбрасывает их версию."""
+    if update_search_vector([recipe_id]):
+        bump_versions('recipes')
+
+
+@task
+def build_image_renditions(recipe_id):
+    generate_renditions(recipe_id)
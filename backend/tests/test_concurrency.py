@@ -0,0 +1,162 @@
+import threading
+from collections import Counter
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientOnRecipe,
+                            Recipe, ShoppingCartItem, ShoppingList)
+from users.models import Follow, User
+
+THREADS = 8
+ROUNDS = 3
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'SQLite не допускает параллельной записи')
+class ConcurrentRequestsTest(TransactionTestCase):
+    """Одновременные запросы к избранному, списку покупок и подпискам.
+
+    Из одинаковых запросов проходит ровно один, остальные получают 400
+    без 5xx, а связи и счетчики остаются согласованными.
+    """
+
+    def setUp(self):
+        self.user, self.author = (
+            User.objects.create_user(
+                email=f'{name}@example.com',
+                username=name,
+                first_name=name,
+                last_name=name,
+                password=name,
+            )
+            for name in ('concurrency-user', 'concurrency-author')
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=1
+        )
+        for number in range(3):
+            IngredientOnRecipe.objects.create(
+                recipe=self.recipe,
+                ingredient=Ingredient.objects.create(
+                    name=f'Ингредиент {number}', meashurement_unit='г'
+                ),
+                amount=number + 1,
+            )
+
+    def fire(self, method, url):
+        """Отправляет THREADS одинаковых запросов одновременно."""
+        return self.fire_all([(self.user, method, url)] * THREADS)
+
+    @staticmethod
+    def fire_all(requests):
+        """Отправляет запросы (пользователь, метод, url) одновременно."""
+        barrier = threading.Barrier(len(requests))
+        statuses = []
+
+        def worker(user, method, url):
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=request)
+            for request in requests
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return Counter(statuses)
+
+    def check(self, url, state):
+        """ROUNDS раз добавляет и удаляет связь, сверяя итог через state."""
+        for _ in range(ROUNDS):
+            for method, success, linked in (('post', 201, 1),
+                                            ('delete', 204, 0)):
+                with self.subTest(method=method):
+                    statuses = self.fire(method, url)
+                    self.assertEqual(
+                        statuses, Counter({success: 1, 400: THREADS - 1})
+                    )
+                    self.assertEqual(state(), (linked, linked))
+
+    def test_favorite(self):
+        self.check(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            lambda: (
+                FavoriteRecipe.objects.filter(
+                    user=self.user, recipe=self.recipe
+                ).count(),
+                Recipe.objects.get(pk=self.recipe.pk).favorites_count,
+            )
+        )
+
+    def test_shopping_cart(self):
+        self.check(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            self.shopping_cart_state
+        )
+
+    def test_subscribe(self):
+        self.check(
+            f'/api/users/{self.author.pk}/subscribe/',
+            lambda: (
+                Follow.objects.filter(
+                    user=self.user, following=self.author
+                ).count(),
+                User.objects.get(pk=self.author.pk).followers_count,
+            )
+        )
+
+    def shopping_cart_state(self):
+        """Связь и счетчик; суммы в списке покупок сверяются сразу."""
+        links = ShoppingList.objects.filter(
+            user=self.user, recipe=self.recipe
+        ).count()
+        items = dict(ShoppingCartItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'total_amount'))
+        expected = {
+            ingredient_id: amount * links
+            for ingredient_id, amount in ShoppingCartItem.recipe_amounts(
+                self.recipe
+            ).items() if links
+        }
+        self.assertEqual(items, expected)
+        return (
+            links, Recipe.objects.get(pk=self.recipe.pk).shopping_carts_count
+        )
+
+    def test_cross_subscribe(self):
+        """Встречные подписки двух пользователей не блокируют друг друга."""
+        pairs = ((self.user, self.author), (self.author, self.user))
+        for _ in range(ROUNDS):
+            for method, success, linked in (('post', 201, 1),
+                                            ('delete', 204, 0)):
+                with self.subTest(method=method):
+                    statuses = self.fire_all([
+                        (user, method, f'/api/users/{author.pk}/subscribe/')
+                        for user, author in pairs
+                        for _ in range(THREADS // 2)
+                    ])
+                    self.assertEqual(statuses, Counter({
+                        success: 2, 400: THREADS - 2
+                    }))
+                    for user, author in pairs:
+                        self.assertEqual(
+                            Follow.objects.filter(
+                                user=user, following=author
+                            ).count(),
+                            linked
+                        )
+                        self.assertEqual(
+                            User.objects.get(pk=author.pk).followers_count,
+                            linked
+                        )
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class KeysetPaginationTest(TestCase):
+    """Курсор не сочетается с фильтрами, меняющими порядок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Автор',
+            password='password',
+        )
+        for number in range(3):
+            Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_cursor_pages(self):
+        response = self.client.get('/api/recipes/', {'cursor': '', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_with_ordering_filters(self):
+        # search меняет порядок только на PostgreSQL (SearchRank).
+        for params in ({'ordering': '-favorites'}, {'ingredients': '1'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': '', **params}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientOnRecipe,
+                            Recipe, ShoppingList, Tag)
+from users.models import User
+
+# Анониму флаги избранного и списка покупок не нужны - на запрос меньше.
+LIST_QUERIES = {'anonymous': 6, 'authorized': 7}
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Читатель',
+            password='password',
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color='#FF0000',
+                               slug=f'tag-{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      meashurement_unit='г')
+            for number in range(3)
+        ]
+        for number in range(12):
+            author = User.objects.create_user(
+                email=f'author-{number}@example.com',
+                username=f'author-{number}',
+                first_name='Автор',
+                last_name=str(number),
+                password='password',
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10,
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+            for ingredient in ingredients:
+                IngredientOnRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+            if number % 2:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            else:
+                ShoppingList.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        for name, client in (('anonymous', self.anonymous),
+                             ('authorized', self.authorized)):
+            for limit in (2, 6, 12):
+                with self.subTest(client=name, limit=limit):
+                    cache.clear()
+                    with self.assertNumQueries(LIST_QUERIES[name]):
+                        response = client.get(
+                            '/api/recipes/', {'limit': limit}
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
@@ -23,6 +23,8 @@ class UserAdmin(admin.ModelAdmin):
         'username',
         'first_name',
         'last_name',
+        'followers_count',
+        'recipes_count',
     )
     list_display_links = (
         'username',
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.RunSQL(
+            'UPDATE users_user SET followers_count = ('
+            'SELECT COUNT(*) FROM users_follow '
+            'WHERE users_follow.following_id = users_user.id)',
+            migrations.RunSQL.noop,
+        ),
+    ]
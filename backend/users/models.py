@@ -4,9 +4,10 @@ from django.db import models
 from core.constants import (MAX_LENGTH_EMAIL_USER, MAX_LENGTH_FIRST_NAME_USER,
                             MAX_LENGTH_LAST_NAME_USER,
                             MAX_LENGTH_USERNAME_USER)
+from core.models import CounterFieldsMixin
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
         'username',
@@ -36,6 +37,18 @@ class User(AbstractUser):
         blank=False,
         null=False
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('followers_count', 'recipes_count')
 
     class Meta:
         verbose_name = 'Пользователь'